@@ -1,3 +1,13 @@
 mkdir -p ./trame_vtk3d/module/serve
 curl https://unpkg.com/@dicehub/vtk3d@0.0.114/vtk3d.js -Lo ./trame_vtk3d/module/serve/vtk3d.js
 curl https://unpkg.com/@dicehub/vtk3d@0.0.114/vtk3d.wasm -Lo ./trame_vtk3d/module/serve/vtk3d.wasm
+
+# Precompressed variants served based on the request Accept-Encoding
+for file in vtk3d.js vtk3d.wasm
+do
+  gzip -9 -k -f ./trame_vtk3d/module/serve/$file
+  if command -v brotli > /dev/null
+  then
+    brotli -q 11 -k -f ./trame_vtk3d/module/serve/$file
+  fi
+done
@@ -1,4 +1,3 @@
-import json
 from pathlib import Path
 
 from trame.app import get_server
@@ -57,25 +56,20 @@ class DemoApp:
         self.server = get_server(server, client_type="vue2")
         self.ui = self.create_ui()
 
-    def init_scene(self, **kwargs):
-        self.wasm.fs.mkdir("/data")
-        self.wasm.fs.writeFile(
-            "/data/sample.stl",
-            STL_FILE.read_text(),
-        )
-        self.wasm.scene.setPathPrefix("/data/")
-        self.wasm.scene.updateCamera(CAMERA_CONFIG)
-        self.wasm.scene.updateGeometry(GEOMETRY_CONFIG)
-        self.wasm.scene.resetCamera()
+    async def init_scene(self, **kwargs):
+        await self.wasm.upload(STL_FILE, "/data/sample.stl")
+        with self.wasm.batch():
+            self.wasm.scene.setPathPrefix("/data/")
+            self.wasm.scene.updateCamera(CAMERA_CONFIG)
+            self.wasm.scene.updateGeometry(GEOMETRY_CONFIG)
+            self.wasm.scene.resetCamera()
 
     def _scene_update_geometry(self, info):
-        info = json.loads(info)
         if info["object"] == "bounding_box" and info["event"] == "modified":
             [minmax, key] = info["info"]["property"].split("/")
             GEOMETRY_CONFIG["bounding_box"][minmax][key] = info["info"]["value"]
 
     def _scene_clicked(self, info):
-        info = json.loads(info)
         if info.get("object") == "bounding_box":
             GEOMETRY_CONFIG["bounding_box"]["interactive"] = not GEOMETRY_CONFIG[
                 "bounding_box"
@@ -1,4 +1,3 @@
-import json
 from pathlib import Path
 
 from trame.app import get_server
@@ -61,23 +60,17 @@ class DemoApp:
     def state(self):
         return self.server.state
 
-    def init_scene(self, **kwargs):
-        self.wasm.fs.mkdir("/data")
-        self.wasm.fs.writeFile(
-            "/data/sample.stl",
-            STL_FILE.read_text(),
-        )
+    async def init_scene(self, **kwargs):
+        await self.wasm.serve_file(STL_FILE, "/data/sample.stl")
         self.wasm.update()
         self.wasm.reset_camera()
 
     def _scene_update_geometry(self, info):
-        info = json.loads(info)
         if info["object"] == "bounding_box" and info["event"] == "modified":
             [minmax, key] = info["info"]["property"].split("/")
             self.state.geometry["bounding_box"][minmax][key] = info["info"]["value"]
 
     def _scene_clicked(self, info):
-        info = json.loads(info)
         if info.get("object") == "bounding_box":
             self.state.geometry["bounding_box"]["interactive"] = (
                 not self.state.geometry["bounding_box"]["interactive"]
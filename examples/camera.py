@@ -1,5 +1,3 @@
-import json
-
 from trame.app import get_server
 from trame.ui.vuetify import SinglePageLayout
 from trame.widgets import vuetify, vtk3d
@@ -55,13 +53,11 @@ class DemoApp:
         return self.server.state
 
     def _scene_update_geometry(self, info):
-        info = json.loads(info)
         if info["object"] == "bounding_box" and info["event"] == "modified":
             [minmax, key] = info["info"]["property"].split("/")
             self.state.geometry["bounding_box"][minmax][key] = info["info"]["value"]
 
     def _scene_clicked(self, info):
-        info = json.loads(info)
         if info.get("object") == "bounding_box":
             self.state.geometry["bounding_box"]["interactive"] = (
                 not self.state.geometry["bounding_box"]["interactive"]
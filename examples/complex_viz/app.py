@@ -1,13 +1,12 @@
-import asyncio
 import yaml
-import json
 from yaml import Loader
 from pathlib import Path
 
-from trame.app import get_server, asynchronous
+from trame.app import get_server
 from trame.ui.vuetify import SinglePageLayout
 from trame.widgets import vuetify, vtk3d
 from trame.decorators import TrameApp, change
+from trame_vtk3d.utils import publish_color_maps
 
 VTU_FILE = Path(__file__).with_name("data.vtu")
 
@@ -21,31 +20,16 @@ class DataApp:
     def __init__(self, server=None):
         self.server = get_server(server, client_type="vue2")
         self.ui = self.create_ui()
-        self.last_change = 0
-        self.last_apply = 0
-        asynchronous.create_task(self.auto_apply())
 
     @property
     def state(self):
         return self.server.state
 
-    def init_scene(self, **kwargs):
-        self.wasm.fs.mkdir("/data")
-        self.wasm.fs.writeFile(
-            f"/data/{VTU_FILE.name}",
-            VTU_FILE.read_text(),
-        )
+    async def init_scene(self, **kwargs):
+        await self.wasm.serve_file(VTU_FILE, f"/data/{VTU_FILE.name}")
         self.wasm.update()
         self.wasm.reset_camera()
 
-    async def auto_apply(self):
-        while True:
-            await asyncio.sleep(0.5)
-            if self.last_change > self.last_apply:
-                with self.state:
-                    self.last_apply = self.last_change
-                    self.apply_clip()
-
     @change("x_clip")
     def on_clip_change(self, x_clip, auto_apply, **kwargs):
         if self.wasm is not None:
@@ -53,7 +37,7 @@ class DataApp:
                 "origin"
             ]["x"] = x_clip
             self.state.geometry["bounding_box"]["max"]["x"] = x_clip
-            self.state.dirty("geometry")
+            self.wasm.update_geometry(self.state.geometry)
 
             if auto_apply:
                 self.apply_clip()
@@ -63,13 +47,12 @@ class DataApp:
         if self.wasm is not None:
             self.state.geometry["bounding_box"]["visible"] = bbox_visible
             self.state.geometry["bounding_box"]["interactive"] = bbox_visible
-            self.state.dirty("geometry")
+            self.wasm.update_geometry(self.state.geometry)
 
     def reset_camera(self):
         self.wasm.scene.resetCamera()
 
     def _scene_update_geometry(self, info):
-        info = json.loads(info)
         if (
             info["object"] == "unstructured_grid/geometry/clip"
             and info["event"] == "modified"
@@ -87,7 +70,7 @@ class DataApp:
             and info["info"]["property"] == "max/x"
         ):
             self.state.x_clip = info["info"]["value"]
-            self.last_change += 1
+            self.apply_clip()
 
     def apply_clip(self):
         for prop in ("origin", "normal"):
@@ -101,7 +84,7 @@ class DataApp:
                 self.state.geometry["unstructured_grid"]["geometry"]["clip2"][prop][
                     i
                 ] = value
-        self.server.force_state_push("geometry")
+        self.wasm.update_geometry(self.state.geometry)
 
     def create_ui(self):
         with SinglePageLayout(self.server) as layout:
@@ -140,6 +123,7 @@ class DataApp:
                     self.wasm = vtk3d.Vtk3dScene(
                         ref="vtk_wasm",
                         path_prefix="/data/",
+                        update_rate=4,
                         camera=(
                             "camera",
                             yaml.load(CAMERA_FILE.read_text(), Loader=Loader),
@@ -148,13 +132,14 @@ class DataApp:
                             "geometry",
                             yaml.load(SCENE_FILE.read_text(), Loader=Loader),
                         ),
-                        color_maps=(
-                            "colors",
-                            json.loads(COLOR_FILE.read_text()),
-                        ),
+                        color_maps=publish_color_maps(COLOR_FILE),
                         on_ready=self.init_scene,
                         on_char="if ($event === 'R') $refs.vtk_wasm.scene.resetCamera()",
                         on_geometry=(self._scene_update_geometry, "[$event]"),
+                        event_throttle={"on_geometry": 50},
+                        pixel_ratio="device",
+                        interactive_ratio={"min": 0.25, "fps": 30},
+                        managed_fs={"budget": 512 * 1024 * 1024},
                         # on_camera="console.log($event)",
                     )
 
@@ -63,6 +63,7 @@ class MultiView:
                         with vuetify.VCol(classes="pa-0 ma-0"):
                             self.wasm_1 = vtk3d.Vtk3dScene(
                                 ref="vtk_wasm1",
+                                camera_link="views",
                                 geometry=("geo1", GEOMETRY_1),
                                 on_ready="$refs.vtk_wasm1.scene.resetCamera()",
                                 on_char="if ($event === 'R') $refs.vtk_wasm1.scene.resetCamera()",
@@ -70,6 +71,7 @@ class MultiView:
                         with vuetify.VCol(classes="pa-0 ma-0"):
                             self.wasm_2 = vtk3d.Vtk3dScene(
                                 ref="vtk_wasm2",
+                                camera_link="views",
                                 geometry=("geo2", GEOMETRY_2),
                                 on_ready="$refs.vtk_wasm2.scene.resetCamera()",
                                 on_char="if ($event === 'R') $refs.vtk_wasm2.scene.resetCamera()",
@@ -0,0 +1,215 @@
+import struct
+import xml.etree.ElementTree as ET
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from trame_vtk3d.mesh import (
+    decimate,
+    extract_surface,
+    levels_of_detail,
+    read_stl,
+    split_pieces,
+    to_vtu,
+)
+
+STL_FILE = Path(__file__).parent.parent / "examples" / "cube.stl"
+
+POINTS = np.arange(15, dtype=np.float32).reshape(5, 3)
+TETRAS = np.array([[0, 1, 2, 3], [1, 2, 3, 4]])
+
+
+def read_vtu(buffers):
+    content = b"".join(bytes(buffer) for buffer in buffers)
+    start = content.index(b"\n_") + 2
+    end = content.rindex(b"\n</AppendedData>")
+    appended = content[start:end]
+    root = ET.fromstring(content[: start - 1] + b"</AppendedData></VTKFile>")
+    compressed = root.get("compressor") is not None
+
+    arrays = {}
+    for node in root.iter("DataArray"):
+        offset = int(node.get("offset"))
+        if compressed:
+            blocks = struct.unpack_from("<Q", appended, offset)[0]
+            if blocks:
+                size = struct.unpack_from("<Q", appended, offset + 24)[0]
+                data = zlib.decompress(appended[offset + 32 : offset + 32 + size])
+            else:
+                data = b""
+        else:
+            size = struct.unpack_from("<Q", appended, offset)[0]
+            data = appended[offset + 8 : offset + 8 + size]
+        dtype = np.dtype(node.get("type").lower())
+        components = int(node.get("NumberOfComponents"))
+        arrays[node.get("Name")] = np.frombuffer(data, dtype).reshape(-1, components)
+
+    return root.find("UnstructuredGrid/Piece"), arrays
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_to_vtu(compress):
+    piece, arrays = read_vtu(
+        to_vtu(
+            POINTS,
+            TETRAS,
+            point_data={"T": np.linspace(0, 1, 5), "V": np.ones((5, 3))},
+            cell_data={"id": np.arange(2, dtype=np.int32)},
+            compress=compress,
+        )
+    )
+
+    assert piece.get("NumberOfPoints") == "5"
+    assert piece.get("NumberOfCells") == "2"
+    assert np.array_equal(arrays["Points"], POINTS)
+    assert np.array_equal(arrays["connectivity"].ravel(), TETRAS.ravel())
+    assert arrays["offsets"].ravel().tolist() == [4, 8]
+    assert arrays["types"].ravel().tolist() == [10, 10]
+    assert arrays["V"].shape == (5, 3)
+    assert arrays["id"].ravel().tolist() == [0, 1]
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_to_vtu_empty(compress):
+    piece, arrays = read_vtu(
+        to_vtu(
+            np.zeros((0, 3)),
+            np.zeros((0, 4), dtype=np.int64),
+            point_data={"T": []},
+            compress=compress,
+        )
+    )
+
+    assert piece.get("NumberOfPoints") == "0"
+    assert piece.get("NumberOfCells") == "0"
+    assert arrays["Points"].shape == (0, 3)
+    assert arrays["T"].size == 0
+
+
+def test_to_vtu_mixed_cells():
+    _, arrays = read_vtu(
+        to_vtu(
+            POINTS,
+            (np.array([0, 1, 2, 1, 2, 3, 4]), np.array([3, 7])),
+            cell_types=[5, 9],
+        )
+    )
+
+    assert arrays["offsets"].ravel().tolist() == [3, 7]
+    assert arrays["types"].ravel().tolist() == [5, 9]
+
+
+def test_to_vtu_requires_cell_types():
+    with pytest.raises(ValueError):
+        to_vtu(POINTS, (np.array([0, 1, 2]), np.array([3])))
+
+
+def test_to_vtu_two_cells_list():
+    piece, arrays = read_vtu(to_vtu(POINTS, [[0, 1, 2], [1, 3, 2]]))
+
+    assert piece.get("NumberOfCells") == "2"
+    assert arrays["offsets"].ravel().tolist() == [3, 6]
+    assert arrays["types"].ravel().tolist() == [5, 5]
+
+
+def hexahedra(nx, ny=1, nz=1):
+    grid = np.mgrid[0 : nz + 1, 0 : ny + 1, 0 : nx + 1]
+    points = grid[::-1].reshape(3, -1).T.astype(float)
+    ids = np.arange(len(points)).reshape(nz + 1, ny + 1, nx + 1)
+    corners = [
+        ids[dz : dz + nz, dy : dy + ny, dx : dx + nx].ravel()
+        for dz in (0, 1)
+        for dy, dx in ((0, 0), (0, 1), (1, 1), (1, 0))
+    ]
+    return points, np.stack(corners, axis=1)
+
+
+def test_extract_surface():
+    points, cells = hexahedra(3)
+    triangles, cell_ids = extract_surface(cells)
+
+    # 3 hexahedra in a row have 14 boundary quads out of 18
+    assert triangles.shape == (28, 3)
+    assert np.bincount(cell_ids).tolist() == [10, 8, 10]
+
+    tetra_triangles, _ = extract_surface([[0, 1, 2, 3], [1, 2, 3, 4]])
+    assert tetra_triangles.shape == (6, 3)
+
+
+def test_decimate():
+    points, cells = hexahedra(8, 8, 8)
+    triangles, _ = extract_surface(cells)
+    values = points[:, 0]
+    new_points, new_triangles, point_data, kept = decimate(
+        points, triangles, 4, {"x": values}
+    )
+
+    assert len(new_points) < len(points)
+    assert new_triangles.max() < len(new_points)
+    assert kept.sum() == len(new_triangles)
+    assert point_data["x"].min() >= values.min()
+    assert point_data["x"].max() <= values.max()
+
+
+def test_levels_of_detail():
+    points, cells = hexahedra(8, 8, 8)
+    levels = levels_of_detail(points, cells, [8, 2], cell_data={"id": np.arange(512)})
+
+    assert [len(level["cells"]) for level in levels] == sorted(
+        len(level["cells"]) for level in levels
+    )
+    assert len(levels[0]["cell_data"]["id"]) == len(levels[0]["cells"])
+    read_vtu(to_vtu(**levels[0]))
+
+
+def test_levels_of_detail_cell_types():
+    grid = np.arange(16).reshape(4, 4)
+    quads = np.stack(
+        [grid[:-1, :-1], grid[:-1, 1:], grid[1:, 1:], grid[1:, :-1]], axis=-1
+    ).reshape(-1, 4)
+    points = np.c_[np.mgrid[0:4, 0:4].reshape(2, -1).T, np.zeros(16)]
+
+    # Per cell types of quads, which would otherwise be taken as tetrahedra
+    (level,) = levels_of_detail(points, quads, [8], cell_types=np.full(9, 9))
+    assert len(level["cells"]) == 18
+
+    with pytest.raises(ValueError, match="single type"):
+        levels_of_detail(points, quads, [8], cell_types=[9] * 8 + [10])
+
+
+def test_read_stl(tmp_path):
+    ascii_points, ascii_triangles = read_stl(STL_FILE)
+    assert ascii_triangles.max() < len(ascii_points)
+
+    facets = np.zeros(
+        len(ascii_triangles),
+        dtype=[("normal", "<f4", 3), ("points", "<f4", (3, 3)), ("attr", "<u2")],
+    )
+    facets["points"] = ascii_points[ascii_triangles]
+    binary = tmp_path / "binary.stl"
+    binary.write_bytes(bytes(80) + struct.pack("<I", len(facets)) + facets.tobytes())
+
+    points, triangles = read_stl(binary)
+    assert np.allclose(points[triangles], ascii_points[ascii_triangles])
+
+
+def test_split_pieces():
+    points, cells = hexahedra(3)
+    pieces = list(
+        split_pieces(
+            points,
+            cells,
+            2,
+            point_data={"x": points[:, 0]},
+            cell_data={"id": [0, 1, 2]},
+        )
+    )
+
+    assert [len(piece["cells"]) for piece in pieces] == [2, 1]
+    assert [len(piece["points"]) for piece in pieces] == [12, 8]
+    assert pieces[1]["cell_data"]["id"].tolist() == [2]
+    for piece in pieces:
+        assert np.array_equal(piece["point_data"]["x"], piece["points"][:, 0])
+        read_vtu(to_vtu(**piece))
@@ -0,0 +1,31 @@
+import hashlib
+from types import SimpleNamespace
+
+from aiohttp import web
+
+from trame.app import get_server
+from trame_vtk3d import __version__, module
+from trame_vtk3d.module import file_version
+
+
+def test_file_version(tmp_path):
+    path = tmp_path / "vtk3d.wasm"
+    path.write_bytes(b"build 1")
+    version = file_version(path)
+
+    assert version == hashlib.sha256(b"build 1").hexdigest()[:16]
+    path.write_bytes(b"build 2")
+    assert file_version(path) != version
+    assert file_version(tmp_path / "missing.js") == __version__
+
+
+def test_server_bind():
+    server = get_server("test_module", client_type="vue3")
+    server.enable_module(module)
+
+    app = web.Application()
+    server.controller.on_server_bind(SimpleNamespace(app=app))
+    assert len(app.on_response_prepare) == 1
+
+    # Reverse connection or generic backend without an aiohttp application
+    server.controller.on_server_bind(SimpleNamespace(app=None))
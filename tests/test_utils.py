@@ -0,0 +1,61 @@
+import hashlib
+import json
+import stat
+
+from trame_vtk3d.module import data_path
+from trame_vtk3d.utils import diff, merge_patch, publish, publish_color_maps
+
+OLD = {
+    "box": {"type": "BoxWidget", "max": {"x": 1, "y": 1}, "visible": True},
+    "mesh": {"type": "VTUFile", "path": "data.vtu"},
+}
+
+
+def test_diff_equal():
+    assert diff(OLD, dict(OLD)) is None
+
+
+def test_diff_nested():
+    new = {
+        "box": {"type": "BoxWidget", "max": {"x": 2, "y": 1}},
+        "mesh": OLD["mesh"],
+        "bar": {"type": "ScalarBar"},
+    }
+    patch = diff(OLD, new)
+    assert patch == {
+        "box": {"max": {"x": 2}, "visible": None},
+        "bar": {"type": "ScalarBar"},
+    }
+    assert merge_patch(OLD, patch) == new
+
+
+def test_merge_patch_shares_unchanged_branches():
+    result = merge_patch(OLD, {"box": {"visible": False}})
+    assert result["mesh"] is OLD["mesh"]
+    assert result["box"]["visible"] is False
+    assert OLD["box"]["visible"] is True
+
+
+def test_publish_replaces_unexpected_content():
+    digest = hashlib.sha256(b"genuine").hexdigest()
+    (data_path / digest).write_bytes(b"planted")
+
+    assert publish(b"genuine") == (digest, f"__trame_vtk3d_data/{digest}")
+    assert (data_path / digest).read_bytes() == b"genuine"
+    assert stat.S_IMODE(data_path.stat().st_mode) == 0o700
+
+
+def test_publish_color_maps(tmp_path):
+    presets = [
+        {"Name": "Jet", "RGBPoints": [0, 0, 0, 1, 1, 1, 0, 0]},
+        {"Name": "Gray", "RGBPoints": [0, 0, 0, 0, 1, 1, 1, 1]},
+    ]
+    path = tmp_path / "presets.json"
+    path.write_text(json.dumps(presets))
+
+    url = publish_color_maps(path)
+    assert url == publish_color_maps(presets)
+
+    index = json.loads((data_path / url.split("/")[-1]).read_text())
+    assert sorted(index) == ["gray", "jet"]
+    assert json.loads((data_path / index["jet"]).read_text()) == presets[0]
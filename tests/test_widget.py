@@ -0,0 +1,467 @@
+import asyncio
+import copy
+import hashlib
+
+import numpy as np
+import pytest
+
+from trame.app import get_server
+from trame_vtk3d.module import data_path
+from trame_vtk3d.widgets.vtk3d import UPLOAD_WINDOW, Vtk3dScene
+
+
+@pytest.fixture
+def scene():
+    server = get_server("test_widget", client_type="vue3")
+    calls = []
+    server.js_call = lambda ref, method, *args: calls.append((ref, method, *args))
+    widget = Vtk3dScene(trame_server=server, ref="view")
+    widget.calls = calls
+    return widget
+
+
+def test_upload_bytes_in_chunks(scene):
+    asyncio.run(scene._upload(b"0123456789", "/data/file.bin", 4))
+
+    assert [call[1] for call in scene.calls] == ["uploadChunk"] * 3
+    assert [call[3] for call in scene.calls] == [0, 4, 8]
+    assert b"".join(bytes(call[5]) for call in scene.calls) == b"0123456789"
+    assert all(call[4] == 10 for call in scene.calls)
+
+
+def test_upload_path(scene, tmp_path):
+    path = tmp_path / "data.bin"
+    path.write_bytes(bytes(range(256)) * 5)
+    asyncio.run(scene._upload(path, "/data/data.bin", 512))
+
+    assert len(scene.calls) == 3
+    assert b"".join(call[5] for call in scene.calls) == path.read_bytes()
+
+
+def test_upload_empty(scene):
+    asyncio.run(scene._upload(b"", "/data/empty", 4))
+
+    assert scene.calls == [("view", "uploadChunk", "/data/empty", 0, 0, b"")]
+
+
+def test_upload_flow_control(scene):
+    def chunks():
+        return [call for call in scene.calls if call[1] == "uploadChunk"]
+
+    async def upload():
+        task = scene.upload(bytes(20), "/data/file.bin", chunk_size=1)
+        for _ in range(10):
+            await asyncio.sleep(0)
+        # Waiting for the client to acknowledge the first chunks
+        assert len(chunks()) == UPLOAD_WINDOW
+        while not task.done():
+            for call in scene.calls:
+                if call[1] == "rpcExec":
+                    scene._on_rpc({"id": call[2], "result": None})
+            await asyncio.sleep(0)
+        await task
+
+    asyncio.run(upload())
+
+    assert b"".join(bytes(call[5]) for call in chunks()) == bytes(20)
+    acks = [call[3] for call in scene.calls if call[1] == "rpcExec"]
+    assert acks == ["sync"] * 5
+
+
+def test_upload_cached(scene):
+    digest = hashlib.sha256(b"cached").hexdigest()
+
+    async def upload(cached):
+        task = scene.upload(b"cached", "/data/file.bin", cache=True)
+        await asyncio.sleep(0)
+        scene._on_rpc({"id": scene._next_request_id, "result": cached})
+        await task
+
+    asyncio.run(upload([digest]))
+    assert scene.calls[-1] == ("view", "cacheLoad", "/data/file.bin", digest)
+
+    asyncio.run(upload([]))
+    assert scene.calls[-1][1] == "uploadChunk"
+    assert scene.calls[-1][2:5] == ("/data/file.bin", 0, 6)
+    assert scene.calls[-1][6] == digest
+
+
+def test_serve_file(scene, tmp_path):
+    path = tmp_path / "data.bin"
+    path.write_bytes(b"content addressed")
+
+    async def serve_file(source, dest):
+        return await scene.serve_file(source, dest)
+
+    digest = asyncio.run(serve_file(path, "/data/data.bin"))
+
+    assert digest == hashlib.sha256(b"content addressed").hexdigest()
+    assert scene.calls == [
+        (
+            "view",
+            "fetchFile",
+            f"__trame_vtk3d_data/{digest}",
+            "/data/data.bin",
+            digest,
+        )
+    ]
+    assert (data_path / digest).read_bytes() == b"content addressed"
+    assert asyncio.run(serve_file(b"content addressed", "/data/copy.bin")) == digest
+
+
+def test_update_geometry_sends_patches(scene):
+    geometry = {"box": {"max": {"x": 1}}, "mesh": {"path": "a.vtu"}}
+    scene.update_geometry(geometry)
+    initial = copy.deepcopy(geometry)
+    geometry["box"]["max"]["x"] = 2
+    scene.update_geometry(geometry)
+    scene.update_geometry(geometry)
+    scene.update_geometry_patch({"mesh": None})
+
+    assert scene.calls == [
+        ("view", "patchGeometry", initial, True),
+        ("view", "patchGeometry", {"box": {"max": {"x": 2}}}, False),
+        ("view", "patchGeometry", {"mesh": None}, False),
+    ]
+
+
+def test_client_reload(scene):
+    triangle = dict(points=[[0, 0, 0], [1, 0, 0], [0, 1, 0]], cells=[[0, 1, 2]])
+
+    async def mount():
+        scene.update_geometry({"box": {"x": 1}})
+        await scene.set_mesh("mesh", **triangle)
+
+    asyncio.run(mount())
+    scene.calls.clear()
+    scene._on_client({"event": "ready"})
+    asyncio.run(mount())
+
+    patches = [call[2:] for call in scene.calls if call[1] == "patchGeometry"]
+    assert patches == [
+        ({"box": {"x": 1}}, True),
+        ({"mesh": {"type": "VTUFile", "path": "mesh.2.vtu"}}, False),
+    ]
+
+
+def test_object_attributes(scene):
+    scene = Vtk3dScene(trame_server=scene.server, event_throttle={"on_camera": 50})
+    assert ':eventThrottle="{&quot;on_camera&quot;: 50}"' in scene.html
+
+    scene.event_throttle = {"on_geometry": ["debounce", 100]}
+    assert (
+        ':eventThrottle="{&quot;on_geometry&quot;: [&quot;debounce&quot;, 100]}"'
+        in scene.html
+    )
+
+    scene.event_throttle = ("throttle",)
+    assert ':eventThrottle="throttle"' in scene.html
+
+    scene.interactive_ratio = {"fps": 30}
+    assert ':interactiveRatio="{&quot;fps&quot;: 30}"' in scene.html
+    scene.interactive_ratio = 0.5
+    assert 'interactiveRatio="0.5"' in scene.html
+
+    scene = Vtk3dScene(trame_server=scene.server, cache={"quota": 1024})
+    assert ':cache="{&quot;quota&quot;: 1024}"' in scene.html
+
+
+def test_batch(scene):
+    with scene.batch():
+        scene.scene.setPathPrefix("/data/")
+        with scene.batch():
+            scene.fs.mkdir("/data")
+        scene.reset_camera()
+        assert scene.calls == []
+
+    assert scene.calls == [
+        (
+            "view",
+            "batchExec",
+            [
+                ["sceneExec", ["setPathPrefix", "/data/"]],
+                ["fsExec", ["mkdir", "/data"]],
+                ["resetCamera", []],
+            ],
+        )
+    ]
+
+
+def test_set_mesh(scene):
+    async def set_mesh():
+        await scene.set_mesh(
+            "mesh", [[0, 0, 0], [1, 0, 0], [0, 1, 0]], [[0, 1, 2]], opacity=0.5
+        )
+        await scene.set_mesh("mesh", [[0, 0, 0], [1, 0, 0], [0, 1, 0]], [[0, 1, 2]])
+
+    asyncio.run(set_mesh())
+
+    uploads = [call[2] for call in scene.calls if call[1] == "uploadChunk"]
+    patches = [call[2] for call in scene.calls if call[1] == "patchGeometry"]
+    assert uploads == ["/data/mesh.1.vtu", "/data/mesh.2.vtu"]
+    assert patches == [
+        {"mesh": {"opacity": 0.5, "type": "VTUFile", "path": "mesh.1.vtu"}},
+        {"mesh": {"opacity": None, "path": "mesh.2.vtu"}},
+    ]
+
+
+def test_set_mesh_lod(scene):
+    points = np.mgrid[0:4, 0:4, 0:4].reshape(3, -1).T
+    tetras = [[0, 1, 4, 16], [1, 5, 4, 21], [21, 22, 26, 37]]
+
+    async def set_mesh():
+        await scene.set_mesh("mesh", points, tetras, lod=[1])
+
+    asyncio.run(set_mesh())
+
+    steps = [
+        call[1:3]
+        for call in scene.calls
+        if call[1] in ("uploadChunk", "setPathAlias", "patchGeometry", "fsExec")
+    ]
+    assert steps == [
+        ("uploadChunk", "/data/mesh.1.lod0.vtu"),
+        ("setPathAlias", "mesh.1.vtu"),
+        ("patchGeometry", {"mesh": {"type": "VTUFile", "path": "mesh.1.vtu"}}),
+        ("uploadChunk", "/data/mesh.1.vtu"),
+        ("setPathAlias", "mesh.1.vtu"),
+        ("fsExec", "unlink"),
+    ]
+
+
+def test_set_mesh_lod_managed_fs(scene):
+    points = np.mgrid[0:4, 0:4, 0:4].reshape(3, -1).T
+    tetras = [[0, 1, 4, 16], [1, 5, 4, 21], [21, 22, 26, 37]]
+    scene.managed_fs = True
+
+    async def set_mesh():
+        await scene.set_mesh("mesh", points, tetras, lod=[1, 2])
+
+    asyncio.run(set_mesh())
+
+    # The client deletes the levels once no alias references them anymore
+    steps = [
+        call[1:4]
+        for call in scene.calls
+        if call[1] in ("uploadChunk", "setPathAlias", "patchGeometry", "fsExec")
+    ]
+    assert [step for step in steps if step[0] != "uploadChunk"] == [
+        ("setPathAlias", "mesh.1.vtu", "mesh.1.lod0.vtu"),
+        ("patchGeometry", {"mesh": {"type": "VTUFile", "path": "mesh.1.vtu"}}, False),
+        ("setPathAlias", "mesh.1.vtu", "mesh.1.lod1.vtu"),
+        ("setPathAlias", "mesh.1.vtu", None),
+    ]
+
+
+def test_stream_pieces(scene):
+    triangle = dict(points=[[0, 0, 0], [1, 0, 0], [0, 1, 0]], cells=[[0, 1, 2]])
+
+    async def stream():
+        await scene.stream_pieces("parts", [triangle, b"piece"], opacity=0.5)
+
+    asyncio.run(stream())
+
+    steps = [
+        call[1:3] for call in scene.calls if call[1] in ("uploadChunk", "patchGeometry")
+    ]
+    assert steps == [
+        ("uploadChunk", "/data/parts.1.piece0.vtu"),
+        (
+            "patchGeometry",
+            {
+                "parts": {
+                    "type": "VTUFile",
+                    "opacity": 0.5,
+                    "pieces": {"0": "parts.1.piece0.vtu"},
+                }
+            },
+        ),
+        ("uploadChunk", "/data/parts.1.piece1.vtu"),
+        ("patchGeometry", {"parts": {"pieces": {"1": "parts.1.piece1.vtu"}}}),
+    ]
+
+
+def test_memory(scene):
+    scene = Vtk3dScene(
+        trame_server=scene.server,
+        ref="memory",
+        on_memory="console.log($event)",
+        managed_fs={"budget": 4096},
+    )
+    usage = {"files": 2, "fs": 1024, "budget": 4096, "heap": 65536}
+    scene._on_client({"event": "memory", "value": usage})
+
+    assert scene.memory == usage
+    assert '@on-memory="console.log($event)"' in scene.html
+    assert ':managedFs="{&quot;budget&quot;: 4096}"' in scene.html
+
+
+def test_metrics(scene):
+    scene = Vtk3dScene(
+        trame_server=scene.server,
+        ref="metrics",
+        metrics=5000,
+        on_metrics=(lambda frames: None, "[$event.frames]"),
+    )
+    report = {
+        "startup": {"runtime": 120.5, "compile": 300.2, "instantiate": 40.1},
+        "calls": {"updateGeometry": {"count": 3, "total": 12.0, "max": 8.5}},
+        "frames": {
+            "buckets": [4, 8, 16, 33, 66, 100],
+            "counts": [10, 2, 0, 0, 0, 0, 1],
+            "count": 13,
+            "total": 150.0,
+            "max": 120.0,
+        },
+        "fs": {"written": 4096, "files": 2},
+        "heap": 65536,
+    }
+    scene._on_client({"event": "metrics", "value": report})
+
+    assert scene.metrics == report
+    assert 'metrics="5000"' in scene.html
+    assert "[$event.frames])" in scene.html
+
+
+def test_update_rate(scene):
+    scene = Vtk3dScene(trame_server=scene.server, ref="rate", update_rate=20)
+    scene.calls = []
+    scene.server.js_call = lambda ref, method, *args: scene.calls.append(
+        (method, *args)
+    )
+
+    async def slide():
+        for x in range(5):
+            scene.update_geometry({"box": {"x": x}})
+        scene.update_geometry_patch({"box": {"y": 1}})
+        assert len(scene.calls) == 1
+        await asyncio.sleep(0.1)
+        scene.update_camera({"zoom": 1})
+
+    asyncio.run(slide())
+
+    assert scene.calls == [
+        ("patchGeometry", {"box": {"x": 0}}, True),
+        ("patchGeometry", {"box": {"x": 4, "y": 1}}, False),
+        ("patchCamera", {"zoom": 1}, True),
+    ]
+
+
+def test_time_series(scene):
+    async def send():
+        await scene.set_time_series("flow", [b"step0", b"step1"], opacity=0.5)
+
+    asyncio.run(send())
+    scene.play(fps=24, loop=False)
+    scene.seek(1)
+
+    steps = [call[1:] for call in scene.calls if call[1] != "uploadChunk"]
+    assert steps == [
+        (
+            "patchGeometry",
+            {
+                "flow": {
+                    "type": "VTUFile",
+                    "opacity": 0.5,
+                    "prefetch": 2,
+                    "steps": ["flow.1.step0.vtu"],
+                }
+            },
+            False,
+        ),
+        (
+            "patchGeometry",
+            {"flow": {"steps": ["flow.1.step0.vtu", "flow.1.step1.vtu"]}},
+            False,
+        ),
+        ("play", 24, False),
+        ("seek", 1),
+    ]
+
+
+def test_render_images(scene):
+    cameras = [{"position": [1, 0, 0]}, {"position": [0, 1, 0]}]
+
+    async def render():
+        images = asyncio.ensure_future(
+            scene.render_images(cameras, (64, 32), "jpeg", 0.8)
+        )
+        await asyncio.sleep(0)
+        scene._on_rpc({"id": 1, "result": [b"x", b"y"]})
+        return await images
+
+    assert asyncio.run(render()) == [b"x", b"y"]
+    assert scene.calls == [
+        ("view", "rpcExec", 1, "renderImages", [cameras, [64, 32], "jpeg", 0.8])
+    ]
+    with pytest.raises(ValueError):
+        asyncio.run(scene.render_images(cameras, format="gif"))
+
+
+def test_call(scene):
+    async def calls():
+        bounds = scene.scene_async.getBounds("mesh")
+        failure = scene.call("fsExec", "stat", "/missing")
+        await asyncio.sleep(0)
+        scene._on_rpc({"id": 2, "error": "No such file"})
+        scene._on_rpc({"id": 1, "result": [0, 1, 0, 1, 0, 1]})
+        with pytest.raises(RuntimeError):
+            await failure
+        return await bounds
+
+    assert asyncio.run(calls()) == [0, 1, 0, 1, 0, 1]
+    assert scene.calls == [
+        ("view", "rpcExec", 1, "sceneExec", ["getBounds", "mesh"]),
+        ("view", "rpcExec", 2, "fsExec", ["stat", "/missing"]),
+    ]
+    assert scene._requests == {}
+
+
+def test_call_within_batch(scene):
+    async def calls():
+        with scene.batch():
+            scene.reset_camera()
+            bounds = scene.scene_async.getBounds("mesh")
+            scene.render()
+        scene._on_rpc({"id": 1, "result": [0, 1, 0, 1, 0, 1]})
+        return await bounds
+
+    assert asyncio.run(calls()) == [0, 1, 0, 1, 0, 1]
+    assert scene.calls == [
+        ("view", "batchExec", [["resetCamera", []]]),
+        ("view", "rpcExec", 1, "sceneExec", ["getBounds", "mesh"]),
+        ("view", "batchExec", [["renderNow", []]]),
+    ]
+
+
+def test_call_timeout(scene):
+    async def call():
+        return await scene.call("sceneExec", "inspect", timeout=0.01)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(call())
+    assert scene._requests == {}
+
+
+def test_probe(scene):
+    async def probe():
+        task = asyncio.ensure_future(scene.probe([[0, 0, 0], [1, 2, 3]]))
+        await asyncio.sleep(0)
+        packed = np.array([[1, 0.5, 0.5, 0.5], [0, np.nan, np.nan, np.nan]])
+        scene._on_rpc({"id": 1, "result": packed.astype("<f8").tobytes()})
+        return await task
+
+    found, points = asyncio.run(probe())
+
+    (_, method, _, target, (buffer, query)) = scene.calls[0]
+    assert (method, target, query) == ("rpcExec", "probe", "findPointInside")
+    assert np.frombuffer(buffer, "<f8").tolist() == [0, 0, 0, 1, 2, 3]
+    assert found.tolist() == [True, False]
+    assert points[0].tolist() == [0.5, 0.5, 0.5]
+
+
+def test_probe_empty(scene):
+    found, points = asyncio.run(scene.probe(np.zeros((0, 3))))
+
+    assert found.shape == (0,) and points.shape == (0, 3)
+    assert scene.calls == []
@@ -0,0 +1,406 @@
+"""
+Encode NumPy meshes as VTK XML UnstructuredGrid (.vtu) files.
+
+The file is returned as a list of buffers so the array content can be sent
+without being copied into a single bytes object.
+"""
+
+import re
+import struct
+import zlib
+from pathlib import Path
+from xml.sax.saxutils import quoteattr
+
+import numpy as np
+
+VTK_TYPES = {
+    np.dtype("int8"): "Int8",
+    np.dtype("uint8"): "UInt8",
+    np.dtype("int16"): "Int16",
+    np.dtype("uint16"): "UInt16",
+    np.dtype("int32"): "Int32",
+    np.dtype("uint32"): "UInt32",
+    np.dtype("int64"): "Int64",
+    np.dtype("uint64"): "UInt64",
+    np.dtype("float32"): "Float32",
+    np.dtype("float64"): "Float64",
+}
+
+# Number of points per cell => VTK cell type when not provided
+CELL_TYPES = {
+    1: 1,  # VTK_VERTEX
+    2: 3,  # VTK_LINE
+    3: 5,  # VTK_TRIANGLE
+    4: 10,  # VTK_TETRA
+    5: 14,  # VTK_PYRAMID
+    6: 13,  # VTK_WEDGE
+    8: 12,  # VTK_HEXAHEDRON
+}
+
+
+def _as_array(values):
+    array = np.asarray(values)
+    if array.dtype == np.bool_:
+        array = array.astype(np.uint8)
+    if array.dtype.byteorder == ">":
+        array = array.astype(array.dtype.newbyteorder("<"))
+    if array.dtype not in VTK_TYPES:
+        raise TypeError(f"Unsupported array type {array.dtype}")
+    return np.ascontiguousarray(array)
+
+
+def _is_cell_pair(cells):
+    # Only a tuple of 1D arrays: a list of two cells is a list of cells
+    return (
+        isinstance(cells, tuple)
+        and len(cells) == 2
+        and all(isinstance(v, np.ndarray) and v.ndim == 1 for v in cells)
+    )
+
+
+def _cell_arrays(cells, cell_types):
+    if _is_cell_pair(cells):
+        connectivity, offsets = (_as_array(v) for v in cells)
+        if cell_types is None:
+            raise ValueError("cell_types is required for (connectivity, offsets)")
+    else:
+        cells = _as_array(cells)
+        if cells.ndim != 2:
+            raise ValueError("cells must be a (n_cells, n_points) array")
+        n_cells, size = cells.shape
+        connectivity = cells.reshape(-1)
+        offsets = np.arange(size, size * (n_cells + 1), size, dtype=np.int64)
+        if cell_types is None:
+            if size not in CELL_TYPES:
+                raise ValueError(f"cell_types is required for {size} points cells")
+            cell_types = CELL_TYPES[size]
+
+    n_cells = offsets.size
+    cell_types = np.asarray(cell_types, dtype=np.uint8)
+    if cell_types.ndim == 0:
+        cell_types = np.full(n_cells, cell_types, dtype=np.uint8)
+
+    return (
+        connectivity.astype(np.int64, copy=False),
+        offsets.astype(np.int64, copy=False),
+        cell_types,
+    )
+
+
+class _AppendedData:
+    def __init__(self, compress):
+        self.compress = compress
+        self.offset = 0
+        self.buffers = []
+
+    def add(self, array):
+        # memoryview.cast() rejects empty arrays
+        data = memoryview(array.reshape(-1).view(np.uint8))
+        if self.compress and data.nbytes:
+            compressed = zlib.compress(data, self.compress)
+            header = struct.pack("<4Q", 1, data.nbytes, data.nbytes, len(compressed))
+            data = compressed
+        elif self.compress:
+            header = struct.pack("<3Q", 0, 0, 0)
+        else:
+            header = struct.pack("<Q", data.nbytes)
+
+        offset = self.offset
+        self.buffers += [header, data]
+        self.offset += len(header) + len(data)
+        return offset
+
+
+def _data_array(appended, name, values, n_tuples):
+    array = _as_array(values)
+    if n_tuples:
+        components = array.size // n_tuples
+    else:
+        components = int(np.prod(array.shape[1:]))
+    offset = appended.add(array)
+    name_attr = f" Name={quoteattr(name)}" if name else ""
+    return (
+        f'<DataArray type="{VTK_TYPES[array.dtype]}"{name_attr} '
+        f'NumberOfComponents="{components}" format="appended" offset="{offset}"/>'
+    )
+
+
+def to_vtu(
+    points,
+    cells,
+    cell_types=None,
+    point_data=None,
+    cell_data=None,
+    compress=False,
+):
+    """
+    Encode an unstructured grid as a .vtu file with raw appended data.
+
+    :param points: (n_points, 3) array of coordinates
+    :param cells: (n_cells, n) array of point ids for cells of the same size
+                  or a (connectivity, offsets) tuple of 1D arrays using VTK
+                  end offsets
+    :param cell_types: VTK cell type (or one per cell), deduced from the
+                       cell size when cells is a 2D array
+    :param point_data: dict of name => (n_points,) or (n_points, k) arrays
+    :param cell_data: dict of name => (n_cells,) or (n_cells, k) arrays
+    :param compress: False or a zlib compression level (True means 6)
+
+    :return: list of bytes-like buffers making the file content
+    """
+    if compress is True:
+        compress = 6
+
+    points = _as_array(points).reshape(-1, 3)
+    connectivity, offsets, cell_types = _cell_arrays(cells, cell_types)
+    n_points = points.shape[0]
+    n_cells = offsets.size
+    appended = _AppendedData(compress)
+
+    xml = [
+        '<?xml version="1.0"?>',
+        '<VTKFile type="UnstructuredGrid" version="1.0" byte_order="LittleEndian"'
+        ' header_type="UInt64"'
+        + (' compressor="vtkZLibDataCompressor">' if compress else ">"),
+        "<UnstructuredGrid>",
+        f'<Piece NumberOfPoints="{n_points}" NumberOfCells="{n_cells}">',
+        "<PointData>",
+        *(
+            _data_array(appended, name, values, n_points)
+            for name, values in (point_data or {}).items()
+        ),
+        "</PointData>",
+        "<CellData>",
+        *(
+            _data_array(appended, name, values, n_cells)
+            for name, values in (cell_data or {}).items()
+        ),
+        "</CellData>",
+        "<Points>",
+        _data_array(appended, "Points", points, n_points),
+        "</Points>",
+        "<Cells>",
+        _data_array(appended, "connectivity", connectivity, connectivity.size),
+        _data_array(appended, "offsets", offsets, n_cells),
+        _data_array(appended, "types", cell_types, n_cells),
+        "</Cells>",
+        "</Piece>",
+        "</UnstructuredGrid>",
+        '<AppendedData encoding="raw">',
+    ]
+    header = "\n".join(xml).encode() + b"\n_"
+    footer = b"\n</AppendedData>\n</VTKFile>\n"
+
+    return [header, *appended.buffers, footer]
+
+
+# Sides of 3D cells as polygons, by VTK cell type
+CELL_SIDES = {
+    10: [[0, 2, 1], [0, 1, 3], [1, 2, 3], [0, 3, 2]],  # VTK_TETRA
+    12: [  # VTK_HEXAHEDRON
+        [0, 3, 2, 1],
+        [4, 5, 6, 7],
+        [0, 1, 5, 4],
+        [1, 2, 6, 5],
+        [2, 3, 7, 6],
+        [3, 0, 4, 7],
+    ],
+}
+
+
+def extract_surface(cells, cell_type=None):
+    """
+    Extract the boundary of cells of a single type as triangles.
+
+    :param cells: (n_cells, n) array of point ids of triangles, quads,
+                  tetrahedra or hexahedra
+    :param cell_type: VTK cell type or one per cell, all the same, deduced
+                      from the cell size if not provided (4 points cells
+                      being tetrahedra, use 9 for quads)
+
+    :return: (triangles, cell_ids) with cell_ids the index of the cell each
+             triangle comes from
+    """
+    cells = np.asarray(cells)
+    if cells.ndim != 2:
+        raise ValueError("cells must be a (n_cells, n_points) array")
+    n_cells, size = cells.shape
+    if np.ndim(cell_type):
+        types = np.unique(cell_type)
+        if types.size > 1:
+            raise ValueError(
+                f"Cells of a single type are required, got types {types.tolist()}"
+            )
+        cell_type = int(types[0]) if types.size else None
+    if cell_type is None:
+        cell_type = CELL_TYPES.get(size)
+
+    if cell_type in (5, 9):  # VTK_TRIANGLE, VTK_QUAD
+        sides = cells
+        cell_ids = np.arange(n_cells)
+    elif cell_type in CELL_SIDES:
+        # Boundary sides belong to a single cell
+        side_index = np.asarray(CELL_SIDES[cell_type])
+        sides = cells[:, side_index].reshape(-1, side_index.shape[1])
+        _, inverse, counts = np.unique(
+            np.sort(sides, axis=1), axis=0, return_inverse=True, return_counts=True
+        )
+        boundary = counts[inverse.reshape(-1)] == 1
+        sides = sides[boundary]
+        cell_ids = np.repeat(np.arange(n_cells), side_index.shape[0])[boundary]
+    else:
+        raise ValueError(f"Unsupported cell type {cell_type}")
+
+    # Triangulate polygons as fans
+    size = sides.shape[1]
+    triangles = np.stack(
+        [sides[:, [0, i, i + 1]] for i in range(1, size - 1)], axis=1
+    ).reshape(-1, 3)
+
+    return triangles, np.repeat(cell_ids, size - 2)
+
+
+def decimate(points, triangles, resolution, point_data=None):
+    """
+    Simplify a triangle surface by clustering its points on a regular grid.
+
+    :param points: (n_points, 3) array
+    :param triangles: (n_triangles, 3) array of point ids
+    :param resolution: Number of grid cells along the largest dimension
+    :param point_data: dict of name => array averaged over each cluster
+
+    :return: (points, triangles, point_data, kept) with kept the mask of the
+             input triangles still present
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    triangles = np.asarray(triangles).reshape(-1, 3)
+    origin = points.min(axis=0)
+    size = (points.max(axis=0) - origin).max() / resolution or 1.0
+
+    bins = np.floor((points - origin) / size).astype(np.int64)
+    _, cluster, counts = np.unique(
+        bins, axis=0, return_inverse=True, return_counts=True
+    )
+    cluster = cluster.reshape(-1)
+
+    def average(values):
+        values = np.asarray(values, dtype=np.float64)
+        flat = values.reshape(values.shape[0], -1)
+        sums = np.stack(
+            [
+                np.bincount(cluster, flat[:, i], counts.size)
+                for i in range(flat.shape[1])
+            ],
+            axis=1,
+        )
+        return (sums / counts[:, None]).reshape((counts.size, *values.shape[1:]))
+
+    new_triangles = cluster[triangles]
+    kept = (
+        (new_triangles[:, 0] != new_triangles[:, 1])
+        & (new_triangles[:, 1] != new_triangles[:, 2])
+        & (new_triangles[:, 0] != new_triangles[:, 2])
+    )
+
+    return (
+        average(points),
+        new_triangles[kept],
+        {name: average(values) for name, values in (point_data or {}).items()},
+        kept,
+    )
+
+
+def levels_of_detail(
+    points, cells, resolutions, cell_types=None, point_data=None, cell_data=None
+):
+    """
+    Generate decimated surfaces of a mesh, from the coarsest to the finest.
+
+    :param resolutions: Grid resolutions used by decimate() for each level
+
+    :return: list of to_vtu() keyword arguments, one per level
+    """
+    triangles, cell_ids = extract_surface(cells, cell_types)
+    levels = []
+    for resolution in sorted(resolutions):
+        lod_points, lod_triangles, lod_point_data, kept = decimate(
+            points, triangles, resolution, point_data
+        )
+        levels.append(
+            dict(
+                points=lod_points,
+                cells=lod_triangles,
+                point_data=lod_point_data,
+                cell_data={
+                    name: np.asarray(values)[cell_ids[kept]]
+                    for name, values in (cell_data or {}).items()
+                },
+            )
+        )
+
+    return levels
+
+
+def split_pieces(
+    points, cells, count, cell_types=None, point_data=None, cell_data=None
+):
+    """
+    Split a mesh into pieces of consecutive cells, each piece only holding
+    the points its cells use.
+
+    :param cells: (n_cells, n_points) array
+    :param count: Number of pieces
+
+    :return: generator of to_vtu() keyword arguments, one per piece
+    """
+    points = np.asarray(points)
+    cells = np.asarray(cells)
+    if cells.ndim != 2:
+        raise ValueError("cells must be a (n_cells, n_points) array")
+    if cell_types is not None and np.ndim(cell_types):
+        cell_types = np.asarray(cell_types)
+
+    for ids in np.array_split(np.arange(len(cells)), count):
+        if not ids.size:
+            continue
+        used, connectivity = np.unique(cells[ids], return_inverse=True)
+        yield dict(
+            points=points[used],
+            cells=connectivity.reshape(len(ids), -1),
+            cell_types=cell_types[ids] if np.ndim(cell_types) else cell_types,
+            point_data={
+                name: np.asarray(values)[used]
+                for name, values in (point_data or {}).items()
+            },
+            cell_data={
+                name: np.asarray(values)[ids]
+                for name, values in (cell_data or {}).items()
+            },
+        )
+
+
+def read_stl(path):
+    """
+    Read a binary or ASCII STL file.
+
+    :return: (points, triangles) with duplicated points merged
+    """
+    content = Path(path).read_bytes()
+    n_triangles = int.from_bytes(content[80:84], "little") if len(content) > 84 else 0
+    if len(content) == 84 + 50 * n_triangles:
+        facets = np.frombuffer(
+            content,
+            dtype=np.dtype(
+                [("normal", "<f4", 3), ("points", "<f4", (3, 3)), ("attr", "<u2")]
+            ),
+            count=n_triangles,
+            offset=84,
+        )
+        vertices = facets["points"].reshape(-1, 3)
+    else:
+        vertices = np.array(
+            re.findall(rb"vertex\s+(\S+)\s+(\S+)\s+(\S+)", content), dtype=np.float64
+        )
+
+    points, triangles = np.unique(vertices, axis=0, return_inverse=True)
+    return points, triangles.reshape(-1, 3)
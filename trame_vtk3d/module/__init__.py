@@ -1,6 +1,107 @@
+import atexit
+import hashlib
+import os
+import shutil
+import tempfile
 from pathlib import Path
 
+from trame_vtk3d import __version__
+
+
+def _data_directory():
+    """
+    Directory of the files published by serve_file() and
+    publish_color_maps(), set with the TRAME_VTK3D_DATA environment
+    variable. Nothing is ever removed from it: when set, clean it up as
+    needed. Otherwise a private temporary directory is used and removed
+    when the process exits.
+    """
+    path = os.environ.get("TRAME_VTK3D_DATA")
+    if not path:
+        # Private to the process so no one else can plant content in it
+        path = tempfile.mkdtemp(prefix="trame_vtk3d_")
+        atexit.register(shutil.rmtree, path, ignore_errors=True)
+    path = Path(path).resolve()
+    path.mkdir(mode=0o700, parents=True, exist_ok=True)
+    return path
+
+
+def file_version(path):
+    """
+    Short hash of a file content, versioning its URL so browsers can keep it
+    for good. The package version when the file is missing.
+    """
+    path = Path(path)
+    if not path.is_file():
+        return __version__
+    sha = hashlib.sha256()
+    with path.open("rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            sha.update(block)
+    return sha.hexdigest()[:16]
+
+
 serve_path = str(Path(__file__).with_name("serve").resolve())
-serve = {"__trame_vtk3d": serve_path}
-scripts = ["__trame_vtk3d/trame_vtk3d.umd.js", "__trame_vtk3d/vtk3d.js"]
-vue_use = ["trame_vtk3d"]
+data_path = _data_directory()
+
+serve = {
+    "__trame_vtk3d": serve_path,
+    "__trame_vtk3d_data": str(data_path),
+}
+# vtk3d.js/vtk3d.wasm are loaded by the component when first mounted
+scripts = [
+    "__trame_vtk3d/trame_vtk3d.umd.js"
+    f"?v={file_version(Path(serve_path, 'trame_vtk3d.umd.js'))}"
+]
+vue_use = [
+    (
+        "trame_vtk3d",
+        {
+            "versions": {
+                name: file_version(Path(serve_path, name))
+                for name in ("vtk3d.js", "vtk3d.wasm")
+            }
+        },
+    )
+]
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def setup(server, prefetch=False, **kwargs):
+    """
+    :param prefetch: Load the vtk3d runtime while the browser is idle
+                     instead of waiting for the first Vtk3dScene to mount.
+                     Enable the module with it before creating any widget:
+                     ``server.enable_module(module, prefetch=True)``
+    """
+    server.controller.on_server_bind.add(_add_http_headers)
+    if prefetch:
+        server.enable_module({"vue_use": [("trame_vtk3d", {"prefetch": True})]})
+
+
+def _add_http_headers(wslink_server):
+    try:
+        from aiohttp import web
+    except ImportError:
+        return
+    # Reverse connections and the generic (e.g. Jupyter) backend serve the
+    # files by other means
+    app = getattr(wslink_server, "app", None)
+    if not isinstance(app, web.Application):
+        return
+
+    async def on_response_prepare(request, response):
+        path = request.path
+        if path.startswith("/__trame_vtk3d_data/"):
+            # Content addressed by its hash never changes
+            response.headers["Cache-Control"] = IMMUTABLE
+        elif path.startswith("/__trame_vtk3d/"):
+            if path.endswith(".wasm"):
+                # Required by WebAssembly.compileStreaming
+                response.headers["Content-Type"] = "application/wasm"
+            if "v" in request.query:
+                # Versioned runtime URL
+                response.headers["Cache-Control"] = IMMUTABLE
+
+    app.on_response_prepare.append(on_response_prepare)
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+from .module import data_path
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# (path, size, mtime) => content hash
+_path_hashes = {}
+
+
+def content_hash(source):
+    """
+    Compute the sha256 of a file, a bytes-like content or a list of
+    bytes-like parts.
+    Hashes of files are cached until their size or modification time change.
+    """
+    if isinstance(source, (list, tuple)):
+        sha = hashlib.sha256()
+        for part in source:
+            sha.update(part)
+        return sha.hexdigest()
+
+    if not isinstance(source, (str, Path)):
+        return hashlib.sha256(source).hexdigest()
+
+    path = Path(source).resolve()
+    stat = path.stat()
+    key = (str(path), stat.st_size, stat.st_mtime_ns)
+    if key not in _path_hashes:
+        sha = hashlib.sha256()
+        with path.open("rb") as file:
+            for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b""):
+                sha.update(block)
+        _path_hashes[key] = sha.hexdigest()
+
+    return _path_hashes[key]
+
+
+def publish(source):
+    """
+    Store a file or bytes-like content in the served data directory under
+    its content hash. A file already stored under that name is only kept
+    when its content matches the hash.
+
+    :return: (hash, url) with url relative to the application root
+    """
+    digest = content_hash(source)
+    target = data_path / digest
+    if not target.is_file() or content_hash(target) != digest:
+        tmp_target = data_path / f".{digest}.{os.getpid()}.tmp"
+        if isinstance(source, (str, Path)):
+            shutil.copyfile(source, tmp_target)
+        else:
+            tmp_target.write_bytes(source)
+        os.replace(tmp_target, target)
+
+    return digest, f"__trame_vtk3d_data/{digest}"
+
+
+def publish_color_maps(source):
+    """
+    Publish color map presets one file per preset, plus an index of them,
+    so clients only download the presets their geometry references.
+
+    :param source: Path of a JSON list of presets (as ParaView exports
+                   them) or the list itself
+
+    :return: URL of the index, to use as ``color_maps`` of a scene
+    """
+    if isinstance(source, (str, Path)):
+        source = json.loads(Path(source).read_text())
+
+    index = {}
+    for preset in source:
+        content = json.dumps(preset, separators=(",", ":")).encode()
+        # Preset URLs are relative to the index
+        index[preset["Name"].lower()] = publish(content)[0]
+
+    return publish(json.dumps(index, sort_keys=True).encode())[1]
+
+
+def diff(old, new):
+    """
+    Compute the JSON merge patch (RFC 7386) turning ``old`` into ``new``.
+
+    :return: The patch or None when both documents are equal
+    """
+    if old == new:
+        return None
+
+    if not isinstance(old, dict) or not isinstance(new, dict):
+        return new
+
+    patch = {}
+    for key in old:
+        if key not in new:
+            patch[key] = None
+    for key, value in new.items():
+        if key not in old:
+            patch[key] = value
+        elif old[key] != value:
+            patch[key] = diff(old[key], value)
+
+    return patch
+
+
+def merge_patch(target, patch):
+    """
+    Apply a JSON merge patch (RFC 7386) and return the patched document.
+    ``target`` is left untouched, unchanged branches are shared.
+    """
+    if not isinstance(patch, dict):
+        return patch
+
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = merge_patch(result.get(key), value)
+
+    return result
@@ -1,5 +1,26 @@
+import asyncio
+import collections
+import copy
+import html
+import json
+import time
+from contextlib import contextmanager
+from functools import partial
+from pathlib import Path
+
 from trame_client.widgets.core import AbstractElement
+from trame_server.utils.asynchronous import create_task
+
 from .. import module
+from ..utils import content_hash, diff, merge_patch, publish
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Number of chunks sent ahead of the client acknowledging them
+UPLOAD_WINDOW = 8
+CALL_TIMEOUT = 30
+DEFAULT_PATH_PREFIX = "/data/"
+# Properties taking an object, which can be given as a dict
+OBJECT_ATTRIBUTES = ("cache", "event_throttle", "interactive_ratio", "managed_fs")
 
 
 class HtmlElement(AbstractElement):
@@ -14,14 +35,43 @@ __all__ = [
 ]
 
 
+def _read_chunks(source, chunk_size):
+    if isinstance(source, list):
+        # Group small parts together, slice large ones without copying them
+        pending = bytearray()
+        for part in source:
+            if pending and len(pending) + part.nbytes > chunk_size:
+                yield bytes(pending)
+                pending = bytearray()
+            if part.nbytes < chunk_size:
+                pending += part
+            else:
+                for offset in range(0, part.nbytes, chunk_size):
+                    yield part[offset : offset + chunk_size]
+        if pending:
+            yield bytes(pending)
+    else:
+        with open(source, "rb") as file:
+            yield from iter(lambda: file.read(chunk_size), b"")
+
+
+def _js_literal(value):
+    # trame only renders plain values: bind dicts as JS object literals
+    if isinstance(value, dict):
+        return (html.escape(json.dumps(value)),)
+    return value
+
+
 class MethodBinder:
-    def __init__(self, owner, first_arg):
+    def __init__(self, owner, first_arg, awaitable=False):
         self._owner = owner
-        self._ref = owner.ref
         self._arg1 = first_arg
+        self._awaitable = awaitable
 
     def __call__(self, *args):
-        return self._owner.server.js_call(self._ref, self._arg1, *args)
+        if self._awaitable:
+            return self._owner.call(self._arg1, *args)
+        return self._owner._js_call(self._arg1, *args)
 
     def __getattr__(self, value):
         return lambda *args: self(value, *args)
@@ -31,16 +81,32 @@ class MethodBinder:
 class Vtk3dScene(HtmlElement):
     _next_id = 0
 
-    def __init__(self, **kwargs):
+    def __init__(self, update_rate=None, **kwargs):
+        kwargs["on_rpc"] = (self._on_rpc, "[$event]")
+        kwargs["on_client"] = (self._on_client, "[$event]")
+        self._memory = None
+        self._metrics = None
+        for name in OBJECT_ATTRIBUTES:
+            if name in kwargs:
+                kwargs[name] = _js_literal(kwargs[name])
         super().__init__(
             "vtk-3d-scene",
             **kwargs,
         )
         self._attr_names += [
+            "cache",
             "camera",
+            ("camera_link", "cameraLink"),
             ("color_maps", "colorMaps"),
+            ("event_throttle", "eventThrottle"),
             "geometry",
+            ("interactive_ratio", "interactiveRatio"),
+            ("managed_fs", "managedFs"),
+            "metrics",
             ("path_prefix", "pathPrefix"),
+            ("pixel_ratio", "pixelRatio"),
+            ("render_policy", "renderPolicy"),
+            "worker",
         ]
         self._event_names += [
             "on_ready",
@@ -49,6 +115,12 @@ class Vtk3dScene(HtmlElement):
             "on_render",
             "on_char",
             "on_camera",
+            "on_upload",
+            "on_rpc",
+            "on_client",
+            "on_memory",
+            "on_time",
+            "on_metrics",
         ]
 
         Vtk3dScene._next_id += 1
@@ -57,6 +129,24 @@ class Vtk3dScene(HtmlElement):
 
         self._scene = MethodBinder(self, "sceneExec")
         self._fs = MethodBinder(self, "fsExec")
+        self._scene_async = MethodBinder(self, "sceneExec", awaitable=True)
+        self._fs_async = MethodBinder(self, "fsExec", awaitable=True)
+        self._requests = {}
+        self._next_request_id = 0
+        self._pushed = {}
+        self._mesh_versions = {}
+        self._batch = []
+        self._batch_depth = 0
+        # Pushes of geometry/camera coalesced to update_rate per second
+        self._update_interval = 1 / update_rate if update_rate else 0
+        self._scheduled = {}
+        self._flush_handles = {}
+        self._last_push = {}
+
+    def __setattr__(self, name, value):
+        if name in OBJECT_ATTRIBUTES:
+            value = _js_literal(value)
+        super().__setattr__(name, value)
 
     @property
     def ref(self):
@@ -70,8 +160,574 @@ class Vtk3dScene(HtmlElement):
     def fs(self):
         return self._fs
 
+    @property
+    def scene_async(self):
+        """Same as scene but calls return an awaitable of their result"""
+        return self._scene_async
+
+    @property
+    def fs_async(self):
+        """Same as fs but calls return an awaitable of their result"""
+        return self._fs_async
+
+    @property
+    def memory(self):
+        """
+        Last memory usage reported by a client with ``managed_fs`` enabled:
+        ``{ files, fs, budget, heap }`` with the number of managed files,
+        their size, the FS budget and the WASM heap size in bytes.
+        """
+        return self._memory
+
+    @property
+    def metrics(self):
+        """
+        Last performance report of a client with ``metrics`` enabled (true
+        for every 10 s or the report interval in ms). Times are in ms:
+        ``{ startup, calls: {name: {count, total, max}}, frames: {buckets,
+        counts, count, total, max}, fs: {written, files}, heap }`` where
+        calls, frames and written bytes cover the last interval only.
+        """
+        return self._metrics
+
     def update(self):
-        self.server.js_call(self.ref, "update")
+        self._js_call("update")
 
     def reset_camera(self):
-        self.server.js_call(self.ref, "resetCamera")
+        self._js_call("resetCamera")
+
+    def render(self):
+        """Render the scene right away, whatever the render policy is"""
+        self._js_call("renderNow")
+
+    def play(self, fps=10, loop=True):
+        """
+        Play the time series entries (see set_time_series) on the client
+        from the current step. Progress is reported through the throttled
+        ``on_time`` event with ``{ step, count, playing }``.
+
+        :param fps: Number of steps per second
+        :param loop: Start over after the last step instead of stopping
+        """
+        self._js_call("play", fps, loop)
+
+    def pause(self):
+        """Stop the time series playback"""
+        self._js_call("pause")
+
+    def seek(self, step):
+        """Show the given step index of the time series entries"""
+        self._js_call("seek", step)
+
+    def _js_call(self, method, *args):
+        if self._batch_depth:
+            self._batch.append([method, list(args)])
+        else:
+            self.server.js_call(self.ref, method, *args)
+
+    def call(self, method, *args, timeout=CALL_TIMEOUT):
+        """
+        Call a method of the client component and get its result back.
+
+        >>> bounds = await wasm.call("sceneExec", "getBounds", "mesh")
+        >>> bounds = await wasm.scene_async.getBounds("mesh")
+
+        Binary results (typed arrays) are received as bytes.
+        Several calls can be pending at the same time. Within a batch, the
+        commands queued so far are sent first so the client runs everything
+        in order, as it can't answer from a batch.
+
+        :param timeout: Number of seconds to wait for the result
+
+        :return: An awaitable resolving to the result or raising a
+                 RuntimeError when the method failed on the client
+        """
+        self._next_request_id += 1
+        request_id = self._next_request_id
+        future = asyncio.get_running_loop().create_future()
+        self._requests[request_id] = future
+        self._flush_batch()
+        self.server.js_call(self.ref, "rpcExec", request_id, method, list(args))
+        return asyncio.ensure_future(self._wait_result(request_id, future, timeout))
+
+    async def _wait_result(self, request_id, future, timeout):
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._requests.pop(request_id, None)
+
+    def _on_rpc(self, response):
+        # With several clients connected, the first response wins
+        future = self._requests.get(response.get("id"))
+        if future is None or future.done():
+            return
+        if "error" in response:
+            future.set_exception(RuntimeError(response["error"]))
+        else:
+            future.set_result(response.get("result"))
+
+    def _on_client(self, notification):
+        # Notifications the widget handles itself, before the application
+        if notification.get("event") == "ready":
+            # A new or reloaded client has nothing of what was pushed before
+            self._pushed.clear()
+            self._last_push.clear()
+            self.flush_updates()
+        elif notification.get("event") == "memory":
+            self._memory = notification.get("value")
+        elif notification.get("event") == "metrics":
+            self._metrics = notification.get("value")
+
+    @contextmanager
+    def batch(self):
+        """
+        Queue the calls made on the scene and its filesystem within the
+        context and send them as a single message when leaving it.
+        The client executes them in order and renders once at the end.
+
+        >>> with wasm.batch():
+        ...     wasm.scene.updateCamera(camera)
+        ...     wasm.scene.updateGeometry(geometry)
+        ...     wasm.scene.resetCamera()
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                self._flush_batch()
+
+    def _flush_batch(self):
+        if self._batch:
+            commands, self._batch = self._batch, []
+            self.server.js_call(self.ref, "batchExec", commands)
+
+    def upload(self, source, dest, chunk_size=UPLOAD_CHUNK_SIZE, cache=False):
+        """
+        Stream a file into the WASM filesystem as binary chunks.
+
+        :param source: Path of the file to send, its content as bytes or
+                       a list of bytes-like parts to send one after the other
+        :param dest: Absolute path of the file in the WASM filesystem
+        :param chunk_size: Maximum number of bytes sent per message
+        :param cache: Ask the client whether its persistent cache (see the
+                      ``cache`` property) already holds the content and
+                      only send it when it does not. With several clients
+                      connected, the first answer is used: prefer
+                      serve_file() which is also cached by the client.
+
+        Progress is reported through the ``on_upload`` event with
+        ``{ dest, loaded, total, done }``.
+
+        Large files are paced by the client: at most UPLOAD_WINDOW chunks are
+        read and sent before it acknowledges having written them. With
+        several clients connected, the first one to answer sets the pace.
+
+        :return: The task streaming the file, which can be awaited
+        """
+        return create_task(self._upload(source, dest, chunk_size, cache))
+
+    async def _upload(self, source, dest, chunk_size=UPLOAD_CHUNK_SIZE, cache=False):
+        if isinstance(source, (str, Path)):
+            total = Path(source).stat().st_size
+        else:
+            if not isinstance(source, (list, tuple)):
+                source = [source]
+            source = [memoryview(part).cast("B") for part in source]
+            total = sum(part.nbytes for part in source)
+
+        extra = []
+        if cache:
+            digest = content_hash(source)
+            if digest in await self.call("cacheHas", [digest]):
+                self._js_call("cacheLoad", dest, digest)
+                return
+            extra = [digest]
+
+        offset = 0
+        acks = collections.deque()
+        for index, chunk in enumerate(_read_chunks(source, chunk_size), 1):
+            self.server.js_call(
+                self.ref, "uploadChunk", dest, offset, total, chunk, *extra
+            )
+            offset += len(chunk)
+            # The client answers once the chunks sent before are written:
+            # ask every half window and wait for the previous answer
+            if index % (UPLOAD_WINDOW // 2) == 0:
+                acks.append(self.call("sync"))
+                if len(acks) > 1:
+                    await acks.popleft()
+        for ack in acks:
+            await ack
+
+        if total == 0:
+            self.server.js_call(self.ref, "uploadChunk", dest, 0, 0, b"", *extra)
+
+    async def cached(self, hashes, timeout=CALL_TIMEOUT):
+        """
+        Ask the client which of the content hashes are in its persistent cache.
+
+        :return: The list of cached hashes
+        """
+        return await self.call("cacheHas", list(hashes), timeout=timeout)
+
+    def serve_file(self, source, dest):
+        """
+        Make a file available in the WASM filesystem through HTTP.
+
+        The content is published under its hash so the browser can cache it
+        and the client skips the download when ``dest`` already holds it.
+        Clients with a persistent cache (see the ``cache`` property) load it
+        from there when they have it.
+
+        Hashing and copying the file into the data directory (see
+        trame_vtk3d.module) happens in a thread, without blocking the server.
+
+        :param source: Path of the file to share or its content as bytes
+        :param dest: Absolute path of the file in the WASM filesystem
+
+        :return: The task publishing the file, which can be awaited and
+                 resolves to the content hash of the file
+        """
+        return create_task(self._serve_file(source, dest))
+
+    async def _serve_file(self, source, dest):
+        digest, url = await asyncio.get_running_loop().run_in_executor(
+            None, publish, source
+        )
+        self._js_call("fetchFile", url, dest, digest)
+        return digest
+
+    def update_geometry(self, geometry):
+        """
+        Push a geometry configuration to the client by only sending what
+        changed since the last pushed version.
+
+        With ``update_rate`` set on the scene, pushes are coalesced: at most
+        ``update_rate`` per second are sent, intermediate configurations are
+        dropped and the last one is always sent.
+        """
+        self._schedule("geometry", geometry)
+
+    def update_geometry_patch(self, patch):
+        """
+        Send a JSON merge patch (RFC 7386) of the geometry configuration.
+        A ``None`` value removes the corresponding key.
+        """
+        self._schedule_patch("geometry", patch)
+
+    def update_camera(self, camera):
+        """
+        Push a camera configuration to the client by only sending what
+        changed since the last pushed version (coalesced like geometry).
+        """
+        self._schedule("camera", camera)
+
+    def update_camera_patch(self, patch):
+        """
+        Send a JSON merge patch (RFC 7386) of the camera configuration.
+        """
+        self._schedule_patch("camera", patch)
+
+    def flush_updates(self):
+        """Send the geometry and camera updates waiting for their turn now"""
+        for name in list(self._scheduled):
+            self._flush(name)
+
+    def _schedule_patch(self, name, patch):
+        if not self._update_interval:
+            self._push_patch(name, patch)
+        else:
+            base = self._scheduled.get(name, self._pushed.get(name))
+            self._schedule(name, merge_patch(base, patch))
+
+    def _schedule(self, name, document):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if not self._update_interval or loop is None:
+            self._scheduled.pop(name, None)
+            self._push_document(name, document)
+            return
+
+        # Leading edge right away, then the latest state once per interval
+        self._scheduled[name] = copy.deepcopy(document)
+        if name not in self._flush_handles:
+            last_push = self._last_push.get(name, -self._update_interval)
+            delay = last_push + self._update_interval - time.monotonic()
+            if delay <= 0:
+                self._flush(name)
+            else:
+                self._flush_handles[name] = loop.call_later(delay, self._flush, name)
+
+    def _flush(self, name):
+        handle = self._flush_handles.pop(name, None)
+        if handle:
+            handle.cancel()
+        if name in self._scheduled:
+            self._last_push[name] = time.monotonic()
+            self._push_document(name, self._scheduled.pop(name))
+
+    def _push_document(self, name, document):
+        method = f"patch{name.capitalize()}"
+        previous = self._pushed.get(name)
+        self._pushed[name] = copy.deepcopy(document)
+        if previous is None:
+            self._js_call(method, self._pushed[name], True)
+        else:
+            patch = diff(previous, document)
+            if patch is not None:
+                self._js_call(method, patch, False)
+
+    def _push_patch(self, name, patch):
+        method = f"patch{name.capitalize()}"
+        patch = copy.deepcopy(patch)
+        self._pushed[name] = merge_patch(self._pushed.get(name), patch)
+        self._js_call(method, patch, False)
+
+    def set_mesh(
+        self,
+        name,
+        points,
+        cells,
+        point_data=None,
+        cell_data=None,
+        cell_types=None,
+        compress=False,
+        lod=None,
+        path_prefix=DEFAULT_PATH_PREFIX,
+        **properties,
+    ):
+        """
+        Send a NumPy mesh to the scene and register it as a geometry entry.
+
+        The mesh is encoded as a binary .vtu file (see trame_vtk3d.mesh.to_vtu
+        for the arguments) which is uploaded without intermediate copies of
+        the arrays, so they should not be modified until the returned task
+        is done. Once uploaded, the ``name`` geometry entry is set to
+        ``{ type: "VTUFile", path: ..., **properties }``.
+
+        :param lod: Grid resolutions of simplified surfaces to send before
+                    the full mesh (see trame_vtk3d.mesh.levels_of_detail).
+                    The entry is registered with the coarsest one and swaps
+                    to finer ones as they arrive, its configuration always
+                    referencing the full mesh. Requires cells as a 2D array
+                    of a single cell type.
+        :param path_prefix: Path prefix of the scene, used to locate the file
+
+        :return: The task uploading the mesh, which can be awaited
+        """
+        # A new file name makes the scene reload the entry
+        self._mesh_versions[name] = self._mesh_versions.get(name, 0) + 1
+        file_name = f"{name}.{self._mesh_versions[name]}.vtu"
+        entry = {**properties, "type": "VTUFile", "path": file_name}
+        mesh = dict(
+            points=points,
+            cells=cells,
+            cell_types=cell_types,
+            point_data=point_data,
+            cell_data=cell_data,
+        )
+
+        return create_task(
+            self._set_mesh(name, entry, path_prefix, mesh, compress, lod)
+        )
+
+    async def _set_mesh(self, name, entry, path_prefix, mesh, compress, lod):
+        from ..mesh import levels_of_detail, to_vtu
+
+        loop = asyncio.get_running_loop()
+        file_name = entry["path"]
+        lod_file_name = None
+        # A managed FS deletes the files no entry or alias references anymore
+        managed = self.managed_fs not in (None, False)
+
+        if lod:
+            levels = await loop.run_in_executor(
+                None, partial(levels_of_detail, resolutions=lod, **mesh)
+            )
+            for level, lod_mesh in enumerate(levels):
+                previous_lod = lod_file_name
+                lod_file_name = f"{file_name[:-4]}.lod{level}.vtu"
+                buffers = await loop.run_in_executor(
+                    None, partial(to_vtu, **lod_mesh, compress=compress)
+                )
+                await self._upload(buffers, f"{path_prefix}{lod_file_name}")
+                self._js_call("setPathAlias", file_name, lod_file_name)
+                if not previous_lod:
+                    self._register_entry(name, entry)
+                elif not managed:
+                    self.fs.unlink(f"{path_prefix}{previous_lod}")
+
+        buffers = await loop.run_in_executor(
+            None, partial(to_vtu, **mesh, compress=compress)
+        )
+        await self._upload(buffers, f"{path_prefix}{file_name}")
+        if lod_file_name:
+            self._js_call("setPathAlias", file_name, None)
+            if not managed:
+                self.fs.unlink(f"{path_prefix}{lod_file_name}")
+        else:
+            self._register_entry(name, entry)
+
+    def _register_entry(self, name, entry):
+        previous = (self._pushed.get("geometry") or {}).get(name)
+        self.update_geometry_patch({name: diff(previous, entry) if previous else entry})
+
+    def stream_pieces(
+        self,
+        name,
+        pieces,
+        compress=False,
+        path_prefix=DEFAULT_PATH_PREFIX,
+        **properties,
+    ):
+        """
+        Send a partitioned dataset to the scene one piece at a time.
+
+        Each piece is uploaded to its own file and added to the ``name``
+        geometry entry as soon as it has arrived, so partial results show up
+        right away and the client never holds the whole dataset in a single
+        buffer. The entry is ``{ type: "VTUFile", pieces: {...}, **properties }``
+        which the client expands into one object per piece. Events of these
+        objects report ``name`` as their object, along with their ``piece``.
+
+        :param pieces: Iterable of pieces, each one being a path, bytes,
+                       a list of bytes-like parts or a dict of
+                       trame_vtk3d.mesh.to_vtu arguments. It is consumed
+                       lazily, one piece after the other.
+        :param path_prefix: Path prefix of the scene, used to locate the files
+
+        :return: The task streaming the pieces, which can be awaited
+        """
+        self._mesh_versions[name] = self._mesh_versions.get(name, 0) + 1
+        base_name = f"{name}.{self._mesh_versions[name]}"
+        entry = {"type": "VTUFile", **properties, "pieces": {}}
+
+        return create_task(
+            self._stream_pieces(name, entry, base_name, path_prefix, pieces, compress)
+        )
+
+    async def _stream_pieces(
+        self, name, entry, base_name, path_prefix, pieces, compress
+    ):
+        for index, piece in enumerate(pieces):
+            file_name = f"{base_name}.piece{index}.vtu"
+            await self._upload_mesh(piece, f"{path_prefix}{file_name}", compress)
+            if index:
+                self.update_geometry_patch({name: {"pieces": {str(index): file_name}}})
+            else:
+                self._register_entry(name, {**entry, "pieces": {"0": file_name}})
+
+    def set_time_series(
+        self,
+        name,
+        steps,
+        prefetch=2,
+        compress=False,
+        path_prefix=DEFAULT_PATH_PREFIX,
+        **properties,
+    ):
+        """
+        Send the steps of a transient dataset so the client can play them
+        without going back to the server (see play, pause and seek).
+
+        The steps are uploaded one after the other, the ``name`` geometry
+        entry being ``{ type: "VTUFile", steps: [...], prefetch, **properties }``
+        with the files received so far.
+
+        :param steps: Iterable of steps, each one being a path, bytes,
+                      a list of bytes-like parts or a dict of
+                      trame_vtk3d.mesh.to_vtu arguments
+        :param prefetch: Number of steps the client loads ahead of the
+                         current one while playing
+        :param path_prefix: Path prefix of the scene, used to locate the files
+
+        :return: The task uploading the steps, which can be awaited
+        """
+        self._mesh_versions[name] = self._mesh_versions.get(name, 0) + 1
+        base_name = f"{name}.{self._mesh_versions[name]}"
+        entry = {"type": "VTUFile", **properties, "prefetch": prefetch}
+
+        return create_task(
+            self._set_time_series(name, entry, base_name, path_prefix, steps, compress)
+        )
+
+    async def _set_time_series(
+        self, name, entry, base_name, path_prefix, steps, compress
+    ):
+        files = []
+        for index, step in enumerate(steps):
+            file_name = f"{base_name}.step{index}.vtu"
+            await self._upload_mesh(step, f"{path_prefix}{file_name}", compress)
+            files.append(file_name)
+            self._register_entry(name, {**entry, "steps": list(files)})
+
+    async def _upload_mesh(self, source, dest, compress):
+        if isinstance(source, dict):
+            from ..mesh import to_vtu
+
+            source = await asyncio.get_running_loop().run_in_executor(
+                None, partial(to_vtu, **source, compress=compress)
+            )
+        await self._upload(source, dest)
+
+    async def render_images(
+        self, cameras, size=None, format="png", quality=None, timeout=CALL_TIMEOUT
+    ):
+        """
+        Render the scene from several cameras on the client in one batch.
+
+        The images are rendered and encoded without showing any of them in
+        the view, whose camera is restored afterwards.
+
+        >>> images = await wasm.render_images([camera_x, camera_y], (256, 256))
+
+        :param cameras: Camera configurations, like the ``camera`` property
+        :param size: (width, height) of the images, defaults to the view size
+        :param format: png, jpeg or webp
+        :param quality: Quality between 0 and 1 for jpeg and webp
+        :param timeout: Number of seconds to wait for the images
+
+        :return: The list of encoded images as bytes
+        """
+        if format not in ("png", "jpeg", "webp"):
+            raise ValueError(f"Unsupported image format {format}")
+        images = await self.call(
+            "renderImages",
+            list(cameras),
+            list(size) if size else None,
+            format,
+            quality,
+            timeout=timeout,
+        )
+        return [bytes(image) for image in images]
+
+    async def probe(self, points, method="findPointInside", timeout=CALL_TIMEOUT):
+        """
+        Run a scene point query for many points within a single call.
+
+        :param points: (n, 3) array of coordinates
+        :param method: Scene method to call for each point,
+                       findPointInside or findPointOutside
+        :param timeout: Number of seconds to wait for the result
+
+        :return: (found, points) with found a (n,) boolean array telling
+                 whether the query returned a point and points the (n, 3)
+                 array of returned coordinates (NaN when not found)
+        """
+        import numpy as np
+
+        points = np.ascontiguousarray(points, dtype="<f8").reshape(-1, 3)
+        if not len(points):
+            return np.zeros(0, dtype=bool), points
+        result = await self.call(
+            "probe",
+            memoryview(points.reshape(-1).view(np.uint8)),
+            method,
+            timeout=timeout,
+        )
+        packed = np.frombuffer(result, dtype="<f8").reshape(-1, 4)
+        return packed[:, 0] > 0, packed[:, 1:]
@@ -0,0 +1,137 @@
+/**
+ * File and scene operations of a vtk3d runtime.
+ *
+ * The function must stay self-contained (no reference to anything outside
+ * of it) as its source is also evaluated inside the worker running the
+ * scene in worker mode.
+ */
+export function createBackend(module, scene) {
+  const FS = module.FS;
+  const streams = new Map();
+
+  function mkdirs(filePath) {
+    const parts = filePath.split("/").slice(0, -1);
+    let current = "";
+    for (const part of parts) {
+      if (!part) {
+        continue;
+      }
+      current = `${current}/${part}`;
+      if (!FS.analyzePath(current).exists) {
+        FS.mkdir(current);
+      }
+    }
+  }
+
+  // Copy typed arrays as they may point into the WASM heap
+  function encode(value) {
+    if (ArrayBuffer.isView(value)) {
+      return new Uint8Array(
+        value.buffer,
+        value.byteOffset,
+        value.byteLength
+      ).slice();
+    }
+    if (value && typeof value === "object" && value.$$) {
+      return null; // embind handle
+    }
+    return value ?? null;
+  }
+
+  return {
+    scene(method, args) {
+      return encode(scene[method](...args));
+    },
+    fs(method, args) {
+      return encode(FS[method](...args));
+    },
+    // Write a chunk of a file, returning the number of bytes written so far
+    // or -1 when the file is not being written
+    writeChunk(dest, offset, total, data) {
+      let stream = streams.get(dest);
+      if (offset === 0) {
+        if (stream) {
+          FS.close(stream);
+        }
+        mkdirs(dest);
+        stream = FS.open(dest, "w");
+        streams.set(dest, stream);
+      }
+      if (!stream) {
+        return -1;
+      }
+      FS.write(stream, data, 0, data.length, offset);
+      const loaded = offset + data.length;
+      if (loaded >= total) {
+        FS.close(stream);
+        streams.delete(dest);
+      }
+      return loaded;
+    },
+    writeFile(dest, data) {
+      mkdirs(dest);
+      FS.writeFile(dest, data);
+    },
+    // Size of a file or -1 when it does not exist
+    fileSize(dest) {
+      return FS.analyzePath(dest).exists ? FS.stat(dest).size : -1;
+    },
+    // Render an image per camera and encode them. Everything is rendered
+    // within the same task and the canvas snapshot when capturing, so none
+    // of the intermediate frames is ever presented.
+    renderImages(cameras, size, restoreCamera, type, quality) {
+      const canvas = module.canvas;
+      const previous = [canvas.width, canvas.height];
+      const setSize = ([width, height]) => {
+        canvas.width = width;
+        canvas.height = height;
+        scene.setSize(width, height);
+      };
+      const capture = () =>
+        canvas.convertToBlob
+          ? canvas.convertToBlob({ type, quality })
+          : new Promise((resolve) => canvas.toBlob(resolve, type, quality));
+
+      if (size) {
+        setSize(size);
+      }
+      const blobs = cameras.map((camera) => {
+        scene.updateCamera(camera);
+        scene.render();
+        return capture();
+      });
+      if (size) {
+        setSize(previous);
+      }
+      if (restoreCamera) {
+        scene.updateCamera(restoreCamera);
+      }
+      scene.render();
+
+      return Promise.all(
+        blobs.map(async (pending) => {
+          const blob = await pending;
+          return new Uint8Array(await blob.arrayBuffer());
+        })
+      );
+    },
+    // Size of the WASM heap in bytes, when the runtime exposes it
+    heapSize() {
+      const memory = module.HEAP8 || module.wasmMemory?.buffer;
+      return memory ? memory.byteLength : null;
+    },
+    setPaused(paused) {
+      if (paused) {
+        module.pauseMainLoop?.();
+      } else {
+        module.resumeMainLoop?.();
+      }
+    },
+    close() {
+      for (const stream of streams.values()) {
+        FS.close(stream);
+      }
+      streams.clear();
+    },
+  };
+}
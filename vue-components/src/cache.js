@@ -0,0 +1,110 @@
+/**
+ * Persistent file cache stored in IndexedDB, keyed by content hash.
+ *
+ * File contents and their metadata ({ hash, size, used }) live in separate
+ * stores so the least recently used files can be found without loading
+ * any content.
+ */
+const DB_NAME = "trame_vtk3d";
+const ENTRIES = "entries";
+const CONTENTS = "contents";
+
+export const DEFAULT_CACHE_QUOTA = 1024 * 1024 * 1024;
+
+let dbPromise = null;
+let persistRequested = false;
+
+function done(request) {
+  return new Promise((resolve, reject) => {
+    request.onsuccess = () => resolve(request.result);
+    request.onerror = () => reject(request.error);
+  });
+}
+
+function completed(transaction) {
+  return new Promise((resolve, reject) => {
+    transaction.oncomplete = () => resolve();
+    transaction.onerror = () => reject(transaction.error);
+    transaction.onabort = () => reject(transaction.error);
+  });
+}
+
+function openCache() {
+  if (!dbPromise) {
+    const request = indexedDB.open(DB_NAME, 1);
+    request.onupgradeneeded = () => {
+      const db = request.result;
+      db.createObjectStore(ENTRIES, { keyPath: "hash" }).createIndex(
+        "used",
+        "used"
+      );
+      db.createObjectStore(CONTENTS);
+    };
+    dbPromise = done(request).catch((error) => {
+      dbPromise = null;
+      throw error;
+    });
+  }
+  return dbPromise;
+}
+
+/** Return the hashes of the list that are in the cache */
+export async function cacheHas(hashes) {
+  const db = await openCache();
+  const store = db.transaction(ENTRIES).objectStore(ENTRIES);
+  const found = await Promise.all(
+    hashes.map((hash) => done(store.getKey(hash)))
+  );
+  return hashes.filter((hash, i) => found[i] !== undefined);
+}
+
+/** Return the content of a hash as a Uint8Array or null */
+export async function cacheGet(hash) {
+  const db = await openCache();
+  const transaction = db.transaction([ENTRIES, CONTENTS], "readwrite");
+  const entries = transaction.objectStore(ENTRIES);
+  const [entry, content] = await Promise.all([
+    done(entries.get(hash)),
+    done(transaction.objectStore(CONTENTS).get(hash)),
+  ]);
+  if (!entry || !content) {
+    return null;
+  }
+  entries.put({ ...entry, used: Date.now() });
+  await completed(transaction);
+  return content;
+}
+
+/**
+ * Store a content under its hash, then evict the least recently used
+ * files until the cache fits in quota bytes.
+ */
+export async function cachePut(hash, content, quota = DEFAULT_CACHE_QUOTA) {
+  if (content.byteLength > quota) {
+    return;
+  }
+  if (!persistRequested) {
+    persistRequested = true;
+    navigator.storage?.persist?.();
+  }
+  const db = await openCache();
+  const transaction = db.transaction([ENTRIES, CONTENTS], "readwrite");
+  const entries = transaction.objectStore(ENTRIES);
+  const contents = transaction.objectStore(CONTENTS);
+  contents.put(content, hash);
+  entries.put({ hash, size: content.byteLength, used: Date.now() });
+
+  const cached = await done(entries.index("used").getAll());
+  let total = cached.reduce((sum, entry) => sum + entry.size, 0);
+  for (const entry of cached) {
+    if (total <= quota) {
+      break;
+    }
+    if (entry.hash !== hash) {
+      entries.delete(entry.hash);
+      contents.delete(entry.hash);
+      total -= entry.size;
+    }
+  }
+  await completed(transaction);
+}
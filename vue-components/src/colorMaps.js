@@ -0,0 +1,102 @@
+/**
+ * Color map presets loaded by reference: an index { name: url } (or the
+ * URL of a JSON index) lists the presets, which are only downloaded when a
+ * geometry entry references them. Downloads are shared by the whole page.
+ */
+const indexes = new Map();
+const presets = new Map();
+
+async function fetchJson(url) {
+  const response = await fetch(url);
+  if (!response.ok) {
+    throw new Error(`Unable to fetch ${url}: ${response.status}`);
+  }
+  return response.json();
+}
+
+function shared(cache, key, load) {
+  if (!cache.has(key)) {
+    cache.set(
+      key,
+      load().catch((error) => {
+        cache.delete(key);
+        throw error;
+      })
+    );
+  }
+  return cache.get(key);
+}
+
+// Resolve an index to { lowercase name: absolute preset url }
+function loadIndex(source) {
+  if (typeof source !== "string") {
+    return Promise.resolve(
+      Object.fromEntries(
+        Object.entries(source).map(([name, url]) => [
+          name.toLowerCase(),
+          new URL(url, document.baseURI).href,
+        ])
+      )
+    );
+  }
+  const indexUrl = new URL(source, document.baseURI).href;
+  return shared(indexes, indexUrl, async () => {
+    const index = await fetchJson(indexUrl);
+    return Object.fromEntries(
+      Object.entries(index).map(([name, url]) => [
+        name.toLowerCase(),
+        new URL(url, indexUrl).href,
+      ])
+    );
+  });
+}
+
+/** Whether a color_maps value references presets instead of holding them */
+export function isColorMapIndex(config) {
+  return (
+    typeof config === "string" ||
+    (!!config && typeof config === "object" && !Array.isArray(config))
+  );
+}
+
+/** Names of the color maps referenced anywhere in a geometry config */
+export function referencedColorMaps(geometry) {
+  const names = new Set();
+  const visit = (value) => {
+    if (Array.isArray(value)) {
+      value.forEach(visit);
+    } else if (value && typeof value === "object") {
+      for (const [key, item] of Object.entries(value)) {
+        if (key === "color_map" && typeof item === "string") {
+          names.add(item.toLowerCase());
+        } else {
+          visit(item);
+        }
+      }
+    }
+  };
+  visit(geometry);
+  return names;
+}
+
+/**
+ * Load the presets of the given names that the index knows about.
+ * Returns a Map of lowercase name => preset.
+ */
+export async function loadColorMaps(source, names) {
+  const index = await loadIndex(source);
+  const loaded = new Map();
+  await Promise.all(
+    [...names]
+      .filter((name) => index[name])
+      .map(async (name) => {
+        try {
+          const url = index[name];
+          loaded.set(name, await shared(presets, url, () => fetchJson(url)));
+        } catch (error) {
+          console.warn(`vtk3d: unable to load the ${name} color map`, error);
+        }
+      })
+  );
+  return loaded;
+}
@@ -1,5 +1,31 @@
-import { onMounted, ref, onUnmounted, unref, watch } from "vue";
-import { createVtkModule, addListeners } from "../utils";
+import { nextTick, onMounted, ref, onUnmounted, unref, watch } from "vue";
+import { createBackend } from "../backend";
+import { cacheGet, cacheHas, cachePut, DEFAULT_CACHE_QUOTA } from "../cache";
+import { createMetrics } from "../metrics";
+import {
+  isColorMapIndex,
+  loadColorMaps,
+  referencedColorMaps,
+} from "../colorMaps";
+import {
+  createVtkModule,
+  addListeners,
+  createEventLimiter,
+  decodeEventValue,
+  encodeResult,
+  getWasmModule,
+  isEqual,
+  joinCameraLink,
+  loadRuntime,
+  mergePatch,
+  toUint8Array,
+  watchInteraction,
+} from "../utils";
+import { startWorker, supportsWorker } from "../worker";
+
+// Separates the entry name from the piece in the names of piece objects,
+// "/" being the separator of object paths in the scene
+const PIECE_SEPARATOR = "#";
 
 /**
  * Scene API
@@ -33,17 +59,159 @@ export default {
     "on-render",
     "on-char",
     "on-camera",
+    "on-upload",
+    "on-rpc",
+    "on-client",
+    "on-memory",
+    "on-time",
+    "on-metrics",
+  ],
+  props: [
+    "cache",
+    "camera",
+    "cameraLink",
+    "colorMaps",
+    "eventThrottle",
+    "geometry",
+    "interactiveRatio",
+    "managedFs",
+    "metrics",
+    "pathPrefix",
+    "pixelRatio",
+    "renderPolicy",
+    "worker",
   ],
-  props: ["camera", "colorMaps", "geometry", "pathPrefix"],
   setup(props, { emit, expose }) {
     const scene = ref(null);
     const container = ref(null);
     const canvas = ref(null);
     const canvasWidth = ref(300);
     const canvasHeight = ref(300);
+    const canvasKey = ref(0);
     let vtkModule = null;
+    let backend = null;
+    let workerScene = null;
     let removeListeners = null;
     let resizeObserver = null;
+    let eventLimiter = null;
+    const fileHashes = new Map();
+    const managedFiles = new Map();
+    let referencedFiles = new Set();
+    // Files written since the references were last updated
+    const freshFiles = new Set();
+    // Files deleted by the component the server may still unlink
+    const freedFiles = new Set();
+    let pathPrefix = "/data/";
+    let reportedUsage = null;
+    let colorMapIndex = null;
+    const viewColorMaps = new Map();
+    let timeStep = 0;
+    let viewCamera = null;
+    let capturing = false;
+    const metrics = createMetrics();
+    const startup = {};
+    let metricsTimer = 0;
+    let playback = 0;
+    let currentGeometry = null;
+    let appliedGeometry = null;
+    const pathAliases = new Map();
+    let currentCamera = null;
+    let cameraLink = null;
+    let linkedCamera = null;
+    let linkEcho = false;
+    let removeInteraction = null;
+    let interacting = false;
+    let interactiveScale = 1;
+    let frameLoop = 0;
+    let intersectionObserver = null;
+    let offscreen = false;
+    let paused = false;
+    let heldGeometry = false;
+    let heldForce = false;
+    let heldCamera = null;
+    let heldCameraLinked = false;
+    let heldColorMaps = null;
+    let renderSuspended = 0;
+    let renderPending = false;
+    let renderFrame = 0;
+    let queueTail = Promise.resolve();
+    let queueSize = 0;
+
+    // Keep server driven calls in order, even across asynchronous ones
+    function inOrder(task) {
+      let result;
+      if (queueSize) {
+        result = queueTail.then(task);
+      } else {
+        result = task();
+        if (!(result instanceof Promise)) {
+          return result;
+        }
+      }
+      queueSize++;
+      queueTail = result
+        .catch((error) => console.error(error))
+        .finally(() => {
+          queueSize--;
+        });
+      return result;
+    }
+
+    function ordered(fn) {
+      return (...args) => inOrder(() => fn(...args));
+    }
+
+    function renderNow() {
+      if (renderFrame) {
+        cancelAnimationFrame(renderFrame);
+        renderFrame = 0;
+      }
+      renderPending = !!paused;
+      if (scene.value && !paused) {
+        metrics.frame(() => scene.value.render());
+      }
+    }
+
+    // Mark the scene dirty and render according to the render policy:
+    //  - "frame" (default): at most once per animation frame
+    //  - "immediate": synchronously on every request
+    //  - "manual": only through renderNow()
+    function requestRender() {
+      renderPending = true;
+      if (paused || renderSuspended || props.renderPolicy === "manual") {
+        return;
+      }
+      if (props.renderPolicy === "immediate") {
+        renderNow();
+      } else if (!renderFrame) {
+        renderFrame = requestAnimationFrame(() => {
+          renderFrame = 0;
+          if (renderPending) {
+            renderNow();
+          }
+        });
+      }
+    }
+
+    // pixelRatio: number of canvas pixels per CSS pixel or "device"
+    function pixelRatio() {
+      if (props.pixelRatio === "device") {
+        return window.devicePixelRatio || 1;
+      }
+      return Number(props.pixelRatio) || 1;
+    }
+
+    // interactiveRatio: scale applied while interacting, either a number or
+    // { min, max, fps } to adapt it to the measured frame time
+    function interactiveSettings() {
+      const config = props.interactiveRatio;
+      if (config && typeof config === "object") {
+        return { min: 0.25, max: 1, fps: 30, ...config };
+      }
+      // Numbers set from Python come as strings
+      const ratio = Number(config);
+      return ratio > 0 ? { min: ratio, max: ratio, fps: 0 } : null;
+    }
 
     function resize() {
       const s = unref(scene);
@@ -51,73 +219,533 @@ export default {
         return;
       }
       const { clientWidth, clientHeight } = unref(container);
-      canvasWidth.value = clientWidth;
-      canvasHeight.value = clientHeight;
+      const scale = pixelRatio() * (interacting ? interactiveScale : 1);
+      const width = Math.max(1, Math.round(clientWidth * scale));
+      const height = Math.max(1, Math.round(clientHeight * scale));
+      if (workerScene) {
+        // The canvas belongs to the worker since its transfer
+        workerScene.resize(width, height);
+        requestRender();
+        return;
+      }
+      canvasWidth.value = width;
+      canvasHeight.value = height;
       if (s) {
-        s.setSize(canvasWidth.value, canvasHeight.value);
-        s.render();
+        s.setSize(width, height);
+        requestRender();
       }
     }
 
+    // Measure the frame time while interacting and scale the resolution so
+    // the frame rate gets close to the target one
+    function adaptResolution(settings) {
+      const target = 1000 / settings.fps;
+      let last = performance.now();
+      let lastChange = last;
+      let frameTime = 0;
+      const tick = (now) => {
+        const elapsed = now - last;
+        last = now;
+        frameTime = frameTime ? 0.8 * frameTime + 0.2 * elapsed : elapsed;
+        if (now - lastChange > 250 && frameTime > 0) {
+          lastChange = now;
+          const scale = Math.min(
+            settings.max,
+            Math.max(
+              settings.min,
+              interactiveScale * Math.sqrt(target / frameTime)
+            )
+          );
+          if (Math.abs(scale - interactiveScale) > 0.05) {
+            interactiveScale = scale;
+            resize();
+          }
+        }
+        frameLoop = requestAnimationFrame(tick);
+      };
+      frameLoop = requestAnimationFrame(tick);
+    }
+
+    function onInteraction(active) {
+      const settings = interactiveSettings();
+      if ((active && !settings) || active === interacting) {
+        return;
+      }
+      if (frameLoop) {
+        cancelAnimationFrame(frameLoop);
+        frameLoop = 0;
+      }
+      interacting = active;
+      if (active) {
+        interactiveScale = settings.max;
+        if (settings.fps) {
+          adaptResolution(settings);
+        }
+      }
+      resize();
+    }
+
     function updateCamera(config) {
       if (config && scene.value) {
+        currentCamera = config;
+        viewCamera = config;
+        if (paused) {
+          heldCamera = config;
+          heldCameraLinked = false;
+          return;
+        }
         scene.value.updateCamera(config);
-        scene.value.render();
+        requestRender();
       }
     }
 
-    function updateGeometry(config) {
+    function updateGeometry(config, force = false) {
       if (config && scene.value) {
-        scene.value.updateGeometry(config);
-        scene.value.render();
+        currentGeometry = config;
+        // Apply the geometry once the color maps it uses are available
+        const loading = syncColorMaps(config);
+        if (loading) {
+          return loading.then(() => applyGeometry(force));
+        }
+        applyGeometry(force);
+      }
+    }
+
+    // Time series entries { steps: [path, ...], prefetch } become prefetch + 1
+    // objects named "<name>@<slot>" showing the current step while the next
+    // ones load hidden. Slots follow the position in the window before it
+    // wraps around, so the prefetched steps never share one and moving
+    // forward only loads one new file and toggles visibilities.
+    function resolveSteps(resolved, name, entry) {
+      const { steps, prefetch = 2, ...properties } = entry;
+      const count = steps.length;
+      const slots = Math.min(prefetch + 1, count);
+      const current = Math.min(timeStep, count - 1);
+      for (let k = 0; k < slots; k++) {
+        const step = (current + k) % count;
+        resolved[`${name}@${(current + k) % slots}`] = {
+          ...properties,
+          path: pathAliases.get(steps[step]) || steps[step],
+          visible: properties.visible !== false && step === current,
+        };
+      }
+    }
+
+    // Entries made of pieces become one object per piece, named
+    // "<name>#<piece>", and paths with an alias load the alias file instead
+    function resolveGeometry(config) {
+      let resolved = config;
+      const copy = () => (resolved === config ? { ...config } : resolved);
+      for (const [name, entry] of Object.entries(config)) {
+        if (entry?.steps?.length) {
+          resolved = copy();
+          delete resolved[name];
+          resolveSteps(resolved, name, entry);
+        } else if (entry?.pieces) {
+          resolved = copy();
+          delete resolved[name];
+          const { pieces, ...properties } = entry;
+          for (const [piece, path] of Object.entries(pieces)) {
+            resolved[`${name}${PIECE_SEPARATOR}${piece}`] = {
+              ...properties,
+              path: pathAliases.get(path) || path,
+            };
+          }
+        } else {
+          const alias = entry && pathAliases.get(entry.path);
+          if (alias) {
+            resolved = copy();
+            resolved[name] = { ...entry, path: alias };
+          }
+        }
+      }
+      return resolved;
+    }
+
+    function applyGeometry(force = false) {
+      updateReferences();
+      if (paused) {
+        heldGeometry = true;
+        heldForce = heldForce || force;
+        return;
+      }
+      const forceAll = force || heldForce;
+      heldGeometry = false;
+      heldForce = false;
+      const resolved = resolveGeometry(currentGeometry);
+      if (!forceAll && isEqual(resolved, appliedGeometry)) {
+        return;
+      }
+      // The scene takes the whole configuration, objects left out of it
+      // being removed
+      appliedGeometry = resolved;
+      metrics.call("updateGeometry", () =>
+        scene.value.updateGeometry(resolved)
+      );
+      requestRender();
+    }
+
+    function setPathAlias(path, alias) {
+      if (alias) {
+        pathAliases.set(path, alias);
+      } else {
+        pathAliases.delete(path);
+      }
+      // An alias sent ahead of its entry is only recorded: updating the
+      // references now would leave the alias file up for eviction
+      const used = Object.values(currentGeometry || {}).some((entry) =>
+        filePaths(entry).includes(path)
+      );
+      if (used && scene.value) {
+        applyGeometry();
+      }
+    }
+
+    // Follow the camera of another view of the same link group
+    function applyLinkedCamera(camera) {
+      if (paused) {
+        heldCamera = camera;
+        heldCameraLinked = true;
+      } else if (scene.value) {
+        linkedCamera = camera;
+        viewCamera = camera;
+        linkEcho = true;
+        scene.value.updateCamera(camera);
+        requestRender();
       }
     }
 
+    function setCameraLink(group) {
+      cameraLink?.leave();
+      linkEcho = false;
+      cameraLink = group ? joinCameraLink(group, applyLinkedCamera) : null;
+    }
+
+    // Share camera changes with the linked views, leaving out the ones
+    // coming from following another view so they don't bounce back: the
+    // first camera event after applying a linked camera is its echo,
+    // whenever it comes (worker, manual render policy)
+    function onCameraEvent(camera) {
+      if (linkEcho) {
+        linkEcho = false;
+        return false;
+      }
+      if (isEqual(camera, linkedCamera)) {
+        return false;
+      }
+      cameraLink?.publish(camera);
+      return true;
+    }
+
+    function patchGeometry(patch, replace = false) {
+      const base = replace ? null : currentGeometry;
+      return updateGeometry(mergePatch(base, patch));
+    }
+
+    function patchCamera(patch, replace = false) {
+      const base = replace ? null : currentCamera || props.camera;
+      updateCamera(mergePatch(base, patch));
+    }
+
+    // colorMaps: list of presets, or an index of presets { name: url } or
+    // its URL to only load the presets referenced by the geometry
     function updateColorMaps(config) {
-      if (config && scene.value) {
+      if (config && paused) {
+        heldColorMaps = config;
+      } else if (config && scene.value && isColorMapIndex(config)) {
+        colorMapIndex = config;
+        viewColorMaps.clear();
+        return syncColorMaps(currentGeometry);
+      } else if (config && scene.value) {
+        colorMapIndex = null;
         scene.value.updateColorMaps(config);
-        scene.value.render();
+        requestRender();
       }
     }
 
-    function setPathPrefix(pathPrefix) {
-      if (pathPrefix && scene.value) {
-        scene.value.setPathPrefix(pathPrefix);
-        scene.value.render();
+    // Load the presets of the index referenced by the geometry and not
+    // loaded yet. Returns null when there is nothing to load.
+    function syncColorMaps(geometry) {
+      if (!colorMapIndex || !geometry) {
+        return null;
+      }
+      const missing = [...referencedColorMaps(geometry)].filter(
+        (name) => !viewColorMaps.has(name)
+      );
+      if (!missing.length) {
+        return null;
+      }
+      const index = colorMapIndex;
+      return loadColorMaps(index, missing)
+        .then((loaded) => {
+          if (index !== colorMapIndex || !scene.value) {
+            return;
+          }
+          for (const name of missing) {
+            viewColorMaps.set(name, loaded.get(name) || null);
+          }
+          scene.value.updateColorMaps(
+            [...viewColorMaps.values()].filter(Boolean)
+          );
+          // Apply again entries applied before their color map arrived
+          const uses = referencedColorMaps(appliedGeometry || {});
+          if (missing.some((colorMap) => uses.has(colorMap))) {
+            scene.value.updateGeometry(appliedGeometry);
+          }
+          requestRender();
+        })
+        .catch((error) => console.warn("vtk3d: color maps", error));
+    }
+
+    function setPathPrefix(prefix) {
+      if (prefix && scene.value) {
+        pathPrefix = prefix;
+        scene.value.setPathPrefix(prefix);
+        requestRender();
       }
     }
 
     function update() {
-      updateGeometry(props.geometry);
+      return updateGeometry(currentGeometry || props.geometry, true);
     }
 
     function resetCamera() {
       if (scene.value) {
         scene.value.resetCamera();
-        scene.value.render();
+        requestRender();
       }
     }
 
-    onMounted(async () => {
+    // Views that can't be seen (scrolled away, collapsed, background tab)
+    // stop their main loop and rendering, holding the updates they receive
+    // until they are visible again
+    function updateVisibility() {
+      const hidden = offscreen || document.hidden;
+      if (hidden === paused || !scene.value) {
+        return;
+      }
+      paused = hidden;
+      if (paused) {
+        backend?.setPaused(true);
+        if (renderFrame) {
+          cancelAnimationFrame(renderFrame);
+          renderFrame = 0;
+        }
+        return;
+      }
+      backend?.setPaused(false);
+      if (heldColorMaps) {
+        updateColorMaps(heldColorMaps);
+        heldColorMaps = null;
+      }
+      if (heldCamera) {
+        const camera = heldCamera;
+        heldCamera = null;
+        if (heldCameraLinked) {
+          applyLinkedCamera(camera);
+        } else {
+          updateCamera(camera);
+        }
+      }
+      if (heldGeometry) {
+        applyGeometry();
+      }
+      if (renderPending) {
+        requestRender();
+      }
+    }
+
+    function onIntersection(entries) {
+      offscreen = !entries[entries.length - 1].isIntersecting;
+      updateVisibility();
+    }
+
+    function setEventThrottle(settings) {
+      eventLimiter?.cancel();
+      eventLimiter = createEventLimiter(
+        (event, value) =>
+          event === "memory"
+            ? emitTracked(event, value)
+            : emit(`on-${event}`, value),
+        { on_time: 250, ...settings }
+      );
+    }
+
+    function stepCount() {
+      let count = 0;
+      for (const entry of Object.values(currentGeometry || {})) {
+        count = Math.max(count, entry?.steps?.length || 0);
+      }
+      return count;
+    }
+
+    function emitTime() {
+      eventLimiter?.push("time", {
+        step: timeStep,
+        count: stepCount(),
+        playing: !!playback,
+      });
+    }
+
+    // Show a step of the time series entries
+    function seek(step) {
+      const last = Math.max(stepCount() - 1, 0);
+      timeStep = Math.min(Math.max(Math.round(step), 0), last);
+      if (currentGeometry && scene.value) {
+        applyGeometry();
+      }
+      emitTime();
+    }
+
+    // Go through the steps at fps steps per second, from the next one
+    function play(fps = 10, loop = true) {
+      pause();
+      const interval = 1000 / fps;
+      let last = performance.now();
+      const tick = (now) => {
+        playback = requestAnimationFrame(tick);
+        if (now - last < interval) {
+          return;
+        }
+        last = now - ((now - last) % interval);
+        if (timeStep + 1 < stepCount()) {
+          seek(timeStep + 1);
+        } else if (loop) {
+          seek(0);
+        } else {
+          pause();
+        }
+      };
+      playback = requestAnimationFrame(tick);
+      emitTime();
+    }
+
+    function pause() {
+      if (playback) {
+        cancelAnimationFrame(playback);
+        playback = 0;
+        emitTime();
+      }
+    }
+
+    // Emit an event the widget also keeps track of on the server, ahead of
+    // the handler of the application
+    function emitTracked(event, value = null) {
+      emit("on-client", { event, value });
+      emit(`on-${event}`, value);
+    }
+
+    // Report the events of piece objects under the name of their entry,
+    // with the piece they come from
+    function entryEvent(value) {
+      const object = value?.object;
+      const start =
+        typeof object === "string" ? object.indexOf(PIECE_SEPARATOR) : -1;
+      const name = start < 0 ? null : object.slice(0, start);
+      if (name === null || !currentGeometry?.[name]?.pieces) {
+        return value;
+      }
+      const rest = object.slice(start + PIECE_SEPARATOR.length);
+      const end = rest.includes("/") ? rest.indexOf("/") : rest.length;
+      return {
+        ...value,
+        object: name + rest.slice(end),
+        piece: rest.slice(0, end),
+      };
+    }
+
+    function onSceneEvent(event, value) {
+      const decoded = entryEvent(decodeEventValue(value));
+      if (event === "camera") {
+        if (capturing) {
+          return;
+        }
+        viewCamera = decoded;
+      }
+      if (event === "camera" && cameraLink && !onCameraEvent(decoded)) {
+        return;
+      }
+      eventLimiter?.push(event, decoded);
+    }
+
+    // A boolean attribute set to True from Python comes as an empty string
+    function isSet(value) {
+      return value === "" || !!value;
+    }
+
+    // Record how long a startup phase takes, in ms
+    async function phase(name, promise) {
+      const start = performance.now();
+      const result = await promise;
+      startup[name] = performance.now() - start;
+      return result;
+    }
+
+    // Run the scene in a worker when asked and possible, otherwise on the
+    // main thread. Returns false when unmounted in the meantime.
+    async function startScene() {
+      if (isSet(props.worker) && supportsWorker(canvas)) {
+        try {
+          workerScene = await phase(
+            "worker",
+            startWorker(canvas, onSceneEvent)
+          );
+          if (!unref(canvas)) {
+            workerScene.terminate();
+            return false;
+          }
+          scene.value = workerScene.scene;
+          backend = workerScene.backend;
+          return true;
+        } catch (error) {
+          console.warn("vtk3d: unable to start the worker", error);
+          workerScene = null;
+          // A canvas transferred to a worker can't be used anymore
+          canvasKey.value++;
+          await nextTick();
+        }
+      }
+      const vtk3d = await phase("runtime", loadRuntime());
+      await phase("compile", getWasmModule());
+      if (!unref(canvas)) {
+        return false;
+      }
       vtkModule = createVtkModule(canvas, scene);
-      await window.vtk3d(vtkModule);
-      await vtkModule.ready;
+      await phase(
+        "instantiate",
+        Promise.resolve(vtk3d(vtkModule)).then(() => vtkModule.ready)
+      );
+      backend = createBackend(vtkModule, unref(scene));
+      unref(scene).setCallback(onSceneEvent);
+      return true;
+    }
+
+    onMounted(async () => {
+      setEventThrottle(props.eventThrottle);
+      if (!(await startScene())) {
+        return; // unmounted while loading
+      }
       removeListeners = addListeners(canvas);
-      unref(scene).setCallback((event, value) => {
-        emit(`on-${event}`, value);
-      });
+      removeInteraction = watchInteraction(canvas, onInteraction);
+      setMetrics(props.metrics);
+      setCameraLink(props.cameraLink);
 
       if (window.ResizeObserver) {
         resizeObserver = new ResizeObserver(resize);
         resizeObserver.observe(unref(container));
       }
+      if (window.IntersectionObserver) {
+        intersectionObserver = new IntersectionObserver(onIntersection);
+        intersectionObserver.observe(unref(container));
+      }
+      document.addEventListener("visibilitychange", updateVisibility);
 
       setPathPrefix(props.pathPrefix);
       updateColorMaps(props.colorMaps);
       updateCamera(props.camera);
       updateGeometry(props.geometry);
 
-      emit("on-ready");
+      emitTracked("ready");
     });
 
     onUnmounted(() => {
@@ -129,32 +757,425 @@ export default {
         resizeObserver.disconnect();
         resizeObserver = undefined;
       }
+      intersectionObserver?.disconnect();
+      intersectionObserver = null;
+      document.removeEventListener("visibilitychange", updateVisibility);
+      removeInteraction?.();
+      removeInteraction = null;
+      if (frameLoop) {
+        cancelAnimationFrame(frameLoop);
+        frameLoop = 0;
+      }
+      if (workerScene) {
+        workerScene.terminate();
+        workerScene = null;
+      } else {
+        backend?.close();
+      }
+      backend = null;
+      if (renderFrame) {
+        cancelAnimationFrame(renderFrame);
+        renderFrame = 0;
+      }
+      cancelAnimationFrame(playback);
+      clearInterval(metricsTimer);
+      eventLimiter?.cancel();
+      setCameraLink(null);
       vtkModule = null;
     });
 
-    watch(() => props.camera, updateCamera);
-    watch(() => props.geometry, updateGeometry);
-    watch(() => props.colorMaps, updateColorMaps);
-    watch(() => props.pathPrefix, setPathPrefix);
+    watch(() => props.camera, ordered(updateCamera));
+    watch(
+      () => props.geometry,
+      ordered((config) => updateGeometry(config))
+    );
+    watch(() => props.colorMaps, ordered(updateColorMaps));
+    watch(() => props.pathPrefix, ordered(setPathPrefix));
+    watch(() => props.eventThrottle, setEventThrottle);
+    watch(() => props.pixelRatio, resize);
+    watch(
+      () => props.metrics,
+      (config) => backend && setMetrics(config)
+    );
+    watch(
+      () => props.interactiveRatio,
+      () => onInteraction(false)
+    );
+    watch(
+      () => props.cameraLink,
+      (group) => backend && setCameraLink(group)
+    );
 
     function sceneExec(method, ...args) {
-      return unref(scene)[method](...args);
+      if (method === "setPathPrefix" && args[0]) {
+        pathPrefix = args[0];
+      }
+      return metrics.call(method, () => unref(scene)[method](...args));
+    }
+
+    // metrics: report interval in ms, or true for every 10 s
+    function setMetrics(config) {
+      clearInterval(metricsTimer);
+      metricsTimer = 0;
+      metrics.take();
+      const interval =
+        config === true || config === "" ? 10000 : Number(config) || 0;
+      if (interval > 0) {
+        metricsTimer = setInterval(reportMetrics, interval);
+      }
+    }
+
+    async function reportMetrics() {
+      const report = metrics.take();
+      report.startup = { ...startup };
+      report.fs.files = managedFiles.size;
+      report.heap = (await backend?.heapSize()) ?? null;
+      emitTracked("metrics", report);
     }
 
     function fsExec(method, ...args) {
-      return vtkModule?.FS[method](...args);
+      if (method === "unlink") {
+        // Already deleted when nothing referenced it anymore
+        if (freedFiles.delete(args[0])) {
+          return null;
+        }
+        forgetFile(args[0]);
+      } else if (method === "writeFile") {
+        freedFiles.delete(args[0]);
+      }
+      return backend?.fs(method, args);
     }
 
-    expose({
+    // managedFs: true or { budget } in bytes. Files written by the
+    // component are tracked, deleted once no geometry entry references them
+    // anymore and evicted (least recently used first) over the budget.
+    function managedSettings() {
+      const config = props.managedFs;
+      if (!isSet(config)) {
+        return null;
+      }
+      return { budget: 0, ...(typeof config === "object" ? config : {}) };
+    }
+
+    function filePaths(entry) {
+      const paths = [];
+      if (typeof entry?.path === "string") {
+        paths.push(entry.path);
+      }
+      if (entry?.pieces) {
+        paths.push(...Object.values(entry.pieces));
+      }
+      if (entry?.steps) {
+        paths.push(...entry.steps);
+      }
+      return paths;
+    }
+
+    function updateReferences() {
+      if (!managedSettings()) {
+        return;
+      }
+      const referenced = new Set();
+      for (const entry of Object.values(currentGeometry || {})) {
+        for (const path of filePaths(entry)) {
+          for (const file of [path, pathAliases.get(path)]) {
+            if (file) {
+              referenced.add(file.startsWith("/") ? file : pathPrefix + file);
+            }
+          }
+        }
+      }
+      const now = performance.now();
+      for (const dest of referenced) {
+        const file = managedFiles.get(dest);
+        if (file) {
+          file.used = now;
+        }
+      }
+      for (const dest of referencedFiles) {
+        if (!referenced.has(dest) && managedFiles.has(dest)) {
+          freeFile(dest);
+        }
+      }
+      referencedFiles = referenced;
+      freshFiles.clear();
+      enforceBudget();
+    }
+
+    function trackFile(dest, size) {
+      if (managedSettings()) {
+        managedFiles.set(dest, { size, used: performance.now() });
+        freshFiles.add(dest);
+        freedFiles.delete(dest);
+        enforceBudget();
+      }
+    }
+
+    function forgetFile(dest) {
+      managedFiles.delete(dest);
+      freshFiles.delete(dest);
+      fileHashes.delete(dest);
+    }
+
+    function freeFile(dest) {
+      forgetFile(dest);
+      freedFiles.add(dest);
+      Promise.resolve(backend?.fs("unlink", [dest])).catch((error) =>
+        console.warn("vtk3d: unable to free", dest, error)
+      );
+    }
+
+    function enforceBudget() {
+      const { budget } = managedSettings();
+      let total = 0;
+      for (const { size } of managedFiles.values()) {
+        total += size;
+      }
+      if (budget && total > budget) {
+        // Files not referenced yet are most likely about to be
+        const candidates = [...managedFiles.entries()]
+          .filter(
+            ([dest]) => !referencedFiles.has(dest) && !freshFiles.has(dest)
+          )
+          .sort((a, b) => a[1].used - b[1].used);
+        for (const [dest, { size }] of candidates) {
+          if (total <= budget) {
+            break;
+          }
+          freeFile(dest);
+          total -= size;
+        }
+      }
+      reportUsage(total, budget);
+    }
+
+    async function reportUsage(fs, budget) {
+      const heap = await backend?.heapSize();
+      const usage = { files: managedFiles.size, fs, budget, heap };
+      if (!isEqual(usage, reportedUsage)) {
+        reportedUsage = usage;
+        eventLimiter?.push("memory", usage);
+      }
+    }
+
+    // cache: true or { quota } to keep files in IndexedDB across reloads
+    function cacheQuota() {
+      if (!isSet(props.cache) || !window.indexedDB) {
+        return 0;
+      }
+      return props.cache.quota || DEFAULT_CACHE_QUOTA;
+    }
+
+    async function storeInCache(hash, data) {
+      try {
+        await cachePut(hash, data, cacheQuota());
+      } catch (error) {
+        console.warn("vtk3d: unable to cache", hash, error);
+      }
+    }
+
+    async function uploadChunk(dest, offset, total, chunk, hash) {
+      if (!backend) {
+        return;
+      }
+      if (offset === 0) {
+        fileHashes.delete(dest);
+      }
+      const data = toUint8Array(chunk);
+      metrics.written(data.length);
+      const loaded = await backend.writeChunk(dest, offset, total, data);
+      if (loaded < 0) {
+        return;
+      }
+      const done = loaded >= total;
+      if (done) {
+        trackFile(dest, total);
+      }
+      if (done && hash) {
+        fileHashes.set(dest, hash);
+        if (cacheQuota()) {
+          await storeInCache(hash, await backend.fs("readFile", [dest]));
+        }
+      }
+      emit("on-upload", { dest, loaded, total, done });
+    }
+
+    async function fetchFile(url, dest, hash) {
+      if (!backend) {
+        return;
+      }
+      let size = await backend.fileSize(dest);
+      if (fileHashes.get(dest) !== hash || size < 0) {
+        let data = cacheQuota() ? await cacheGet(hash) : null;
+        if (!data) {
+          const response = await fetch(url);
+          if (!response.ok) {
+            throw new Error(`Unable to fetch ${url}: ${response.status}`);
+          }
+          data = new Uint8Array(await response.arrayBuffer());
+          if (cacheQuota()) {
+            await storeInCache(hash, data);
+          }
+        }
+        size = data.length;
+        metrics.written(size);
+        await backend.writeFile(dest, data);
+        fileHashes.set(dest, hash);
+        trackFile(dest, size);
+      }
+      emit("on-upload", { dest, loaded: size, total: size, done: true });
+    }
+
+    // Write a cached file into the WASM filesystem
+    async function cacheLoad(dest, hash) {
+      const data = backend && cacheQuota() ? await cacheGet(hash) : null;
+      if (!data) {
+        throw new Error(`vtk3d: ${hash} is not in the cache`);
+      }
+      const size = data.length;
+      metrics.written(size);
+      await backend.writeFile(dest, data);
+      fileHashes.set(dest, hash);
+      trackFile(dest, size);
+      emit("on-upload", { dest, loaded: size, total: size, done: true });
+    }
+
+    async function cachedHashes(hashes) {
+      return cacheQuota() ? cacheHas(hashes) : [];
+    }
+
+    // Run a point query for each xyz of a Float64 buffer and pack the
+    // results as [found, x, y, z] per point
+    async function probe(points, method = "findPointInside") {
+      const bytes = toUint8Array(points).slice();
+      const input = new Float64Array(bytes.buffer);
+      const count = Math.floor(input.length / 3);
+      const output = new Float64Array(count * 4).fill(NaN);
+      const s = unref(scene);
+      for (let i = 0; i < count; i++) {
+        const [x, y, z] = input.subarray(i * 3, i * 3 + 3);
+        const found = decodeEventValue(await s[method]({ x, y, z }));
+        const ok = found && Number.isFinite(found.x);
+        output[i * 4] = ok ? 1 : 0;
+        if (ok) {
+          output[i * 4 + 1] = found.x;
+          output[i * 4 + 2] = found.y;
+          output[i * 4 + 3] = found.z;
+        }
+      }
+      return output;
+    }
+
+    // Render the scene from each camera and return the encoded images,
+    // restoring the camera of the view afterwards
+    async function renderImages(cameras, size, format = "png", quality) {
+      if (!backend) {
+        return [];
+      }
+      const type = `image/${format === "jpg" ? "jpeg" : format}`;
+      const restoreCamera = viewCamera || currentCamera || props.camera;
+      capturing = true;
+      try {
+        return await backend.renderImages(
+          cameras,
+          size,
+          restoreCamera,
+          type,
+          quality ?? undefined
+        );
+      } finally {
+        capturing = false;
+      }
+    }
+
+    // Methods the server can call within batchExec/rpcExec
+    const callables = {
       sceneExec,
       fsExec,
-      resize,
+      fetchFile,
+      cacheHas: cachedHashes,
+      cacheLoad,
       setPathPrefix,
       updateCamera,
       updateGeometry,
+      patchGeometry,
+      patchCamera,
+      setPathAlias,
       updateColorMaps,
       update,
       resetCamera,
+      renderNow,
+      probe,
+      renderImages,
+      play,
+      pause,
+      seek,
+      // Answered once the calls received before it are done, which paces
+      // the uploads of the server
+      sync: () => null,
+    };
+
+    // Execute a list of [method, args] in order and render once at the end
+    async function batchExec(commands) {
+      let explicitRender = false;
+      renderSuspended++;
+      try {
+        for (const [method, args] of commands) {
+          if (
+            (method === "sceneExec" && args[0] === "render") ||
+            method === "renderNow"
+          ) {
+            explicitRender = true;
+            continue;
+          }
+          const result = callables[method](...args);
+          if (result instanceof Promise) {
+            await result;
+          }
+        }
+      } finally {
+        renderSuspended--;
+        if (explicitRender) {
+          renderNow();
+        } else {
+          requestRender();
+        }
+      }
+    }
+
+    // Call a method and send its result back to the server
+    async function rpcExec(id, method, args) {
+      try {
+        const result = await callables[method](...args);
+        emit("on-rpc", { id, result: encodeResult(result) });
+      } catch (error) {
+        emit("on-rpc", { id, error: `${error}` });
+      }
+    }
+
+    expose({
+      batchExec: ordered(batchExec),
+      rpcExec: ordered(rpcExec),
+      sceneExec: ordered(sceneExec),
+      fsExec: ordered(fsExec),
+      uploadChunk: ordered(uploadChunk),
+      fetchFile: ordered(fetchFile),
+      cacheLoad: ordered(cacheLoad),
+      resize,
+      requestRender,
+      renderNow: ordered(renderNow),
+      setPathPrefix: ordered(setPathPrefix),
+      updateCamera: ordered(updateCamera),
+      updateGeometry: ordered(updateGeometry),
+      patchGeometry: ordered(patchGeometry),
+      patchCamera: ordered(patchCamera),
+      setPathAlias: ordered(setPathAlias),
+      updateColorMaps: ordered(updateColorMaps),
+      update: ordered(update),
+      resetCamera: ordered(resetCamera),
+      play: ordered(play),
+      pause: ordered(pause),
+      seek: ordered(seek),
     });
 
     return {
@@ -162,9 +1183,13 @@ export default {
       canvas,
       canvasWidth,
       canvasHeight,
+      canvasKey,
       sceneExec,
       fsExec,
+      uploadChunk,
       resize,
+      requestRender,
+      renderNow,
       scene,
       update,
       resetCamera,
@@ -173,6 +1198,7 @@ export default {
   template: `
     <div ref="container" style="position: relative; width: 100%; height: 100%">
       <canvas
+        :key="canvasKey"
         style="position: absolute; left: 0; top: 0; width: 100%; height: 100%;"
         ref="canvas"
         tabindex="-1"
@@ -1,6 +1,11 @@
 import components from "./components";
+import { configureRuntime, prefetchRuntime } from "./utils";
 
-export function install(Vue) {
+export function install(Vue, options) {
+  configureRuntime(options);
+  if (options?.prefetch) {
+    prefetchRuntime();
+  }
   Object.keys(components).forEach((name) => {
     Vue.component(name, components[name]);
   });
@@ -0,0 +1,76 @@
+// Upper bounds (ms) of the frame time histogram buckets, plus one for more
+export const FRAME_BUCKETS = [4, 8, 16, 33, 66, 100];
+
+function createHistogram() {
+  return {
+    buckets: FRAME_BUCKETS,
+    counts: new Array(FRAME_BUCKETS.length + 1).fill(0),
+    count: 0,
+    total: 0,
+    max: 0,
+  };
+}
+
+/**
+ * Collect timings of a scene between two reports:
+ *  - calls: { [name]: { count, total, max } } in ms
+ *  - frames: histogram of the render times
+ *  - written: number of bytes written into the WASM filesystem
+ */
+export function createMetrics() {
+  let calls = {};
+  let frames = createHistogram();
+  let written = 0;
+
+  function addCall(name, elapsed) {
+    calls[name] = calls[name] || { count: 0, total: 0, max: 0 };
+    const stats = calls[name];
+    stats.count++;
+    stats.total += elapsed;
+    stats.max = Math.max(stats.max, elapsed);
+  }
+
+  function addFrame(elapsed) {
+    let bucket = FRAME_BUCKETS.findIndex((limit) => elapsed <= limit);
+    if (bucket < 0) {
+      bucket = FRAME_BUCKETS.length;
+    }
+    frames.counts[bucket]++;
+    frames.count++;
+    frames.total += elapsed;
+    frames.max = Math.max(frames.max, elapsed);
+  }
+
+  // Time fn(), waiting for its result when it returns a promise
+  function measure(record, fn) {
+    const start = performance.now();
+    const result = fn();
+    const done = () => record(performance.now() - start);
+    if (result instanceof Promise) {
+      result.then(done, done);
+    } else {
+      done();
+    }
+    return result;
+  }
+
+  return {
+    call(name, fn) {
+      return measure((elapsed) => addCall(name, elapsed), fn);
+    },
+    frame(fn) {
+      return measure(addFrame, fn);
+    },
+    written(bytes) {
+      written += bytes;
+    },
+    // Return the metrics collected since the previous report
+    take() {
+      const report = { calls, frames, fs: { written } };
+      calls = {};
+      frames = createHistogram();
+      written = 0;
+      return report;
+    },
+  };
+}
@@ -75,10 +75,92 @@ export function addListeners(canvas) {
   };
 }
 
+// versions: { [fileName]: content hash }
+const runtime = {
+  versions: {},
+};
+let wasmModulePromise = null;
+let runtimePromise = null;
+
+export function configureRuntime(options = {}) {
+  Object.assign(runtime, options);
+}
+
+/** Versioned URLs can be cached by the browser for good */
+export function runtimeUrl(fileName) {
+  const version = runtime.versions?.[fileName];
+  const query = version ? `?v=${version}` : "";
+  return `__trame_vtk3d/${fileName}${query}`;
+}
+
+async function compileWasm(url) {
+  if (WebAssembly.compileStreaming) {
+    try {
+      return await WebAssembly.compileStreaming(fetch(url));
+    } catch (error) {
+      // Most likely served without the application/wasm MIME type
+      console.warn("vtk3d: streaming compilation failed", error);
+    }
+  }
+  const response = await fetch(url);
+  return WebAssembly.compile(await response.arrayBuffer());
+}
+
+/** Compile vtk3d.wasm once and share the WebAssembly.Module across views */
+export function getWasmModule() {
+  if (!wasmModulePromise) {
+    wasmModulePromise = compileWasm(runtimeUrl("vtk3d.wasm")).catch((error) => {
+      wasmModulePromise = null;
+      throw error;
+    });
+  }
+  return wasmModulePromise;
+}
+
+/** Inject vtk3d.js on first use and resolve its module factory */
+export function loadRuntime() {
+  if (window.vtk3d) {
+    return Promise.resolve(window.vtk3d);
+  }
+  if (!runtimePromise) {
+    runtimePromise = new Promise((resolve, reject) => {
+      const script = document.createElement("script");
+      script.src = runtimeUrl("vtk3d.js");
+      script.async = true;
+      script.onload = () => resolve(window.vtk3d);
+      script.onerror = () => {
+        runtimePromise = null;
+        script.remove();
+        reject(new Error(`vtk3d: unable to load ${script.src}`));
+      };
+      document.head.appendChild(script);
+    });
+  }
+  return runtimePromise;
+}
+
+export function prefetchRuntime() {
+  const whenIdle = window.requestIdleCallback || ((fn) => setTimeout(fn, 1));
+  whenIdle(() => {
+    loadRuntime().catch((error) => console.error(error));
+    getWasmModule().catch((error) => console.error(error));
+  });
+}
+
 export function createVtkModule(canvas, scene) {
   const module = {
     locateFile() {
-      return "__trame_vtk3d/vtk3d.wasm";
+      return runtimeUrl("vtk3d.wasm");
+    },
+    instantiateWasm(imports, receiveInstance) {
+      getWasmModule()
+        .then((wasmModule) =>
+          WebAssembly.instantiate(wasmModule, imports).then((instance) =>
+            receiveInstance(instance, wasmModule)
+          )
+        )
+        .catch((error) => console.error(error));
+      return {};
     },
     canvas: unref(canvas),
     setWindowTitle() {},
@@ -99,3 +181,252 @@ export function createVtkModule(canvas, scene) {
 
   return module;
 }
+
+export function toUint8Array(data) {
+  if (data instanceof Uint8Array) {
+    return data;
+  }
+  if (ArrayBuffer.isView(data)) {
+    return new Uint8Array(data.buffer, data.byteOffset, data.byteLength);
+  }
+  if (data instanceof ArrayBuffer || Array.isArray(data)) {
+    return new Uint8Array(data);
+  }
+  return new Uint8Array(0);
+}
+
+export function isEqual(a, b) {
+  if (a === b) {
+    return true;
+  }
+  if (!a || !b || typeof a !== "object" || typeof b !== "object") {
+    return false;
+  }
+  if (Array.isArray(a) !== Array.isArray(b)) {
+    return false;
+  }
+  const keys = Object.keys(a);
+  if (keys.length !== Object.keys(b).length) {
+    return false;
+  }
+  return keys.every((key) => key in b && isEqual(a[key], b[key]));
+}
+
+/** JSON merge patch (RFC 7386), unchanged branches of target are shared */
+export function mergePatch(target, patch) {
+  if (!patch || typeof patch !== "object" || Array.isArray(patch)) {
+    return patch;
+  }
+  const result =
+    target && typeof target === "object" && !Array.isArray(target)
+      ? { ...target }
+      : {};
+  for (const [key, value] of Object.entries(patch)) {
+    if (value === null) {
+      delete result[key];
+    } else {
+      result[key] = mergePatch(result[key], value);
+    }
+  }
+  return result;
+}
+
+/** Parse JSON encoded event payloads coming from the scene */
+export function decodeEventValue(value) {
+  if (typeof value === "string" && /^\s*[[{]/.test(value)) {
+    try {
+      return JSON.parse(value);
+    } catch (error) {
+      return value;
+    }
+  }
+  return value;
+}
+
+/** Make a value returned by the scene or its FS safe to send to the server */
+export function encodeResult(value) {
+  if (value instanceof ArrayBuffer || ArrayBuffer.isView(value)) {
+    // Copy as views may point into the WASM heap
+    return toUint8Array(value).slice();
+  }
+  if (typeof value === "string") {
+    return decodeEventValue(value);
+  }
+  if (value && typeof value === "object" && value.$$) {
+    return null; // embind handle
+  }
+  return value ?? null;
+}
+
+// Values sharing that key replace each other while waiting to be emitted
+function mergeKey(value) {
+  if (value && typeof value === "object") {
+    return [value.object, value.event, value.info?.property].join("/");
+  }
+  return "";
+}
+
+/**
+ * Rate limit events before they reach the emitter.
+ * settings: { [eventName]: ms | ["throttle" | "debounce", ms] }
+ */
+export function createEventLimiter(emitter, settings = {}) {
+  const limiters = new Map();
+
+  function getLimiter(event) {
+    if (!limiters.has(event)) {
+      let config = settings[event] ?? settings[`on_${event}`];
+      if (typeof config === "number") {
+        config = ["throttle", config];
+      }
+      limiters.set(
+        event,
+        config
+          ? {
+              mode: config[0],
+              delay: config[1],
+              pending: new Map(),
+              timeout: 0,
+              lastEmit: 0,
+            }
+          : null
+      );
+    }
+    return limiters.get(event);
+  }
+
+  function flush(event, limiter) {
+    clearTimeout(limiter.timeout);
+    limiter.timeout = 0;
+    limiter.lastEmit = performance.now();
+    const values = [...limiter.pending.values()];
+    limiter.pending.clear();
+    values.forEach((value) => emitter(event, value));
+  }
+
+  function push(event, value) {
+    const limiter = getLimiter(event);
+    if (!limiter) {
+      emitter(event, value);
+      return;
+    }
+
+    const key = mergeKey(value);
+    limiter.pending.delete(key);
+    limiter.pending.set(key, value);
+
+    if (limiter.mode === "debounce") {
+      clearTimeout(limiter.timeout);
+      limiter.timeout = setTimeout(() => flush(event, limiter), limiter.delay);
+    } else if (!limiter.timeout) {
+      const wait = limiter.lastEmit + limiter.delay - performance.now();
+      if (wait <= 0) {
+        flush(event, limiter);
+      } else {
+        limiter.timeout = setTimeout(() => flush(event, limiter), wait);
+      }
+    }
+  }
+
+  function cancel() {
+    for (const limiter of limiters.values()) {
+      if (limiter) {
+        clearTimeout(limiter.timeout);
+      }
+    }
+    limiters.clear();
+  }
+
+  return { push, cancel };
+}
+
+// Camera link groups shared by all the scenes of the page
+const cameraLinks = new Map();
+
+/**
+ * Join a camera link group. onCamera(camera) is called with the camera of
+ * the other members when they publish it.
+ * Returns { publish(camera), leave() }
+ */
+export function joinCameraLink(group, onCamera) {
+  if (!cameraLinks.has(group)) {
+    cameraLinks.set(group, new Set());
+  }
+  const members = cameraLinks.get(group);
+  members.add(onCamera);
+  return {
+    publish(camera) {
+      for (const member of members) {
+        if (member !== onCamera) {
+          member(camera);
+        }
+      }
+    },
+    leave() {
+      members.delete(onCamera);
+      if (!members.size) {
+        cameraLinks.delete(group);
+      }
+    },
+  };
+}
+
+/**
+ * Call onChange(true) when the user starts interacting with the canvas
+ * (pointer drag or wheel) and onChange(false) once it stopped for endDelay.
+ * Returns a function removing the listeners.
+ */
+export function watchInteraction(canvas, onChange, endDelay = 200) {
+  const element = unref(canvas);
+  let active = false;
+  let pointers = 0;
+  let endTimeout = 0;
+
+  function start() {
+    clearTimeout(endTimeout);
+    if (!active) {
+      active = true;
+      onChange(true);
+    }
+  }
+
+  function end() {
+    clearTimeout(endTimeout);
+    endTimeout = setTimeout(() => {
+      if (active && !pointers) {
+        active = false;
+        onChange(false);
+      }
+    }, endDelay);
+  }
+
+  function onPointerDown() {
+    pointers++;
+    start();
+  }
+
+  function onPointerUp() {
+    if (pointers) {
+      pointers--;
+      end();
+    }
+  }
+
+  function onWheel() {
+    start();
+    end();
+  }
+
+  element.addEventListener("pointerdown", onPointerDown);
+  element.addEventListener("wheel", onWheel, { passive: true });
+  window.addEventListener("pointerup", onPointerUp);
+  window.addEventListener("pointercancel", onPointerUp);
+
+  return () => {
+    clearTimeout(endTimeout);
+    element.removeEventListener("pointerdown", onPointerDown);
+    element.removeEventListener("wheel", onWheel);
+    window.removeEventListener("pointerup", onPointerUp);
+    window.removeEventListener("pointercancel", onPointerUp);
+  };
+}
@@ -0,0 +1,330 @@
+import { toRaw, unref } from "vue";
+import { createBackend } from "./backend";
+import { getWasmModule, runtimeUrl } from "./utils";
+
+const INPUT_EVENTS = [
+  "pointerdown",
+  "pointermove",
+  "pointerup",
+  "pointercancel",
+  "mousedown",
+  "mousemove",
+  "mouseup",
+  "mouseenter",
+  "mouseleave",
+  "click",
+  "dblclick",
+  "wheel",
+  "keydown",
+  "keyup",
+  "keypress",
+  "focus",
+  "blur",
+];
+
+const EVENT_FIELDS = [
+  "altKey",
+  "button",
+  "buttons",
+  "charCode",
+  "clientX",
+  "clientY",
+  "code",
+  "ctrlKey",
+  "deltaMode",
+  "deltaX",
+  "deltaY",
+  "deltaZ",
+  "detail",
+  "key",
+  "keyCode",
+  "location",
+  "metaKey",
+  "movementX",
+  "movementY",
+  "offsetX",
+  "offsetY",
+  "pageX",
+  "pageY",
+  "pointerId",
+  "pointerType",
+  "repeat",
+  "screenX",
+  "screenY",
+  "shiftKey",
+  "which",
+];
+
+/**
+ * Entry point of the worker. Like createBackend, it must stay
+ * self-contained as its source is what the worker evaluates.
+ */
+function workerMain(createBackend) {
+  let canvas = null;
+  let backend = null;
+  const rect = { left: 0, top: 0, width: 300, height: 300 };
+
+  // The runtime expects a DOM canvas and registers its input listeners on
+  // it or on the document: emulate what it uses on the OffscreenCanvas
+  function emulateDom() {
+    canvas.style = {};
+    canvas.focus = () => {};
+    canvas.getBoundingClientRect = () => ({
+      ...rect,
+      x: rect.left,
+      y: rect.top,
+      right: rect.left + rect.width,
+      bottom: rect.top + rect.height,
+    });
+    Object.defineProperty(canvas, "clientWidth", { get: () => rect.width });
+    Object.defineProperty(canvas, "clientHeight", { get: () => rect.height });
+    self.document = {
+      addEventListener: (...args) => canvas.addEventListener(...args),
+      removeEventListener: (...args) => canvas.removeEventListener(...args),
+      querySelector: () => canvas,
+      getElementById: () => canvas,
+      body: canvas,
+      documentElement: canvas,
+    };
+    self.window = self;
+  }
+
+  function dispatch(init) {
+    for (const target of [canvas, self]) {
+      const event = new Event(init.type, { cancelable: true });
+      for (const [key, value] of Object.entries(init)) {
+        Object.defineProperty(event, key, { value });
+      }
+      Object.defineProperty(event, "target", { value: canvas });
+      target.dispatchEvent(event);
+    }
+  }
+
+  const handlers = {
+    async init({ jsUrl, wasmModule, offscreen, width, height, bounds }) {
+      canvas = offscreen;
+      canvas.width = width;
+      canvas.height = height;
+      Object.assign(rect, bounds);
+      importScripts(jsUrl);
+      emulateDom();
+      const module = {
+        canvas,
+        setWindowTitle() {},
+        instantiateWasm(imports, receiveInstance) {
+          WebAssembly.instantiate(wasmModule, imports).then((instance) =>
+            receiveInstance(instance, wasmModule)
+          );
+          return {};
+        },
+      };
+      await new Promise((resolve, reject) => {
+        module.onRuntimeInitialized = resolve;
+        Promise.resolve(self.vtk3d(module)).catch(reject);
+      });
+      const scene = new module.Scene();
+      scene.setCallback((event, value) => self.postMessage({ event, value }));
+      scene.start();
+      backend = createBackend(module, scene);
+    },
+    resize(width, height, bounds) {
+      canvas.width = width;
+      canvas.height = height;
+      Object.assign(rect, bounds);
+      backend.scene("setSize", [width, height]);
+    },
+    input(init, bounds) {
+      if (bounds) {
+        Object.assign(rect, bounds);
+      }
+      dispatch(init);
+    },
+  };
+
+  self.onmessage = async ({ data: { id, op, args } }) => {
+    try {
+      const handler = handlers[op] || ((...a) => backend[op](...a));
+      const result = await handler(...args);
+      self.postMessage({ id, result });
+    } catch (error) {
+      self.postMessage({ id, error: `${error}` });
+    }
+  };
+}
+
+// Reactive proxies can't be sent to a worker
+function toPlain(value) {
+  const raw = toRaw(value);
+  if (Array.isArray(raw)) {
+    return raw.map(toPlain);
+  }
+  if (raw && Object.getPrototypeOf(raw) === Object.prototype) {
+    return Object.fromEntries(
+      Object.entries(raw).map(([key, item]) => [key, toPlain(item)])
+    );
+  }
+  return raw;
+}
+
+function serializeEvent(event) {
+  const init = { type: event.type };
+  for (const field of EVENT_FIELDS) {
+    if (field in event) {
+      init[field] = event[field];
+    }
+  }
+  return init;
+}
+
+function getBounds(element) {
+  const { left, top, width, height } = element.getBoundingClientRect();
+  return { left, top, width, height };
+}
+
+// Transfer the content of a Uint8Array without copying when possible
+function transferable(data) {
+  const whole =
+    data.byteOffset === 0 && data.byteLength === data.buffer.byteLength;
+  return whole ? data : data.slice();
+}
+
+export function supportsWorker(canvas) {
+  return (
+    typeof Worker !== "undefined" &&
+    "transferControlToOffscreen" in unref(canvas)
+  );
+}
+
+/**
+ * Run the scene of a canvas in a dedicated worker rendering to an
+ * OffscreenCanvas, forwarding input events to it.
+ * onEvent(event, value) receives the scene events.
+ *
+ * Returns { scene, backend, resize(width, height), terminate() } where the
+ * scene and backend methods return promises of their result.
+ */
+export async function startWorker(canvas, onEvent) {
+  const element = unref(canvas);
+  const source = `(${workerMain})(${createBackend});`;
+  const url = URL.createObjectURL(
+    new Blob([source], { type: "text/javascript" })
+  );
+  const worker = new Worker(url);
+  const pending = new Map();
+  let nextId = 0;
+
+  worker.onmessage = ({ data }) => {
+    if (data.event !== undefined) {
+      onEvent(data.event, data.value);
+      return;
+    }
+    const request = pending.get(data.id);
+    pending.delete(data.id);
+    if (data.error !== undefined) {
+      request?.reject(new Error(data.error));
+    } else {
+      request?.resolve(data.result);
+    }
+  };
+  worker.onerror = (event) => {
+    for (const request of pending.values()) {
+      request.reject(new Error(event.message));
+    }
+    pending.clear();
+  };
+
+  function post(op, args, transfer = []) {
+    return new Promise((resolve, reject) => {
+      nextId++;
+      pending.set(nextId, { resolve, reject });
+      worker.postMessage({ id: nextId, op, args }, transfer);
+    });
+  }
+
+  function onInput(event) {
+    if (event.type === "wheel") {
+      event.preventDefault();
+    }
+    const bounds = event.type.endsWith("down") ? getBounds(element) : null;
+    post("input", [serializeEvent(event), bounds]);
+  }
+
+  try {
+    const wasmModule = await getWasmModule();
+    const offscreen = element.transferControlToOffscreen();
+    await post(
+      "init",
+      [
+        {
+          jsUrl: new URL(runtimeUrl("vtk3d.js"), document.baseURI).href,
+          wasmModule,
+          offscreen,
+          width: element.width,
+          height: element.height,
+          bounds: getBounds(element),
+        },
+      ],
+      [offscreen]
+    );
+  } catch (error) {
+    worker.terminate();
+    throw error;
+  } finally {
+    URL.revokeObjectURL(url);
+  }
+
+  for (const type of INPUT_EVENTS) {
+    element.addEventListener(type, onInput, { passive: type !== "wheel" });
+  }
+
+  const scene = new Proxy(
+    {},
+    {
+      get(target, method) {
+        if (typeof method !== "string" || method.startsWith("__")) {
+          return undefined;
+        }
+        if (method === "then" || method === "toJSON") {
+          return undefined;
+        }
+        return (...args) => post("scene", [method, toPlain(args)]);
+      },
+    }
+  );
+
+  const backend = {
+    scene: (method, args) => post("scene", [method, toPlain(args)]),
+    fs: (method, args) => post("fs", [method, toPlain(args)]),
+    writeChunk(dest, offset, total, data) {
+      const chunk = transferable(data);
+      return post("writeChunk", [dest, offset, total, chunk], [chunk.buffer]);
+    },
+    writeFile(dest, data) {
+      const content = transferable(data);
+      return post("writeFile", [dest, content], [content.buffer]);
+    },
+    fileSize: (dest) => post("fileSize", [dest]),
+    heapSize: () => post("heapSize", []),
+    renderImages: (...args) => post("renderImages", toPlain(args)),
+    setPaused: (paused) => post("setPaused", [paused]),
+    close: () => post("close", []),
+  };
+
+  return {
+    scene,
+    backend,
+    resize(width, height) {
+      post("resize", [width, height, getBounds(element)]);
+    },
+    terminate() {
+      for (const type of INPUT_EVENTS) {
+        element.removeEventListener(type, onInput);
+      }
+      worker.terminate();
+      for (const request of pending.values()) {
+        request.reject(new Error("vtk3d: worker terminated"));
+      }
+      pending.clear();
+    },
+  };
+}